@@ -1,78 +1,168 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+# Filled in with import and first-use durations, see startup_timings().
+STARTUP_TIMINGS = {}
+
 import os
+import contextlib
+import hashlib
 import json
-from aqt import mw
+from aqt import mw, gui_hooks
 from aqt.qt import (
     QAction, QDialog, QVBoxLayout, QHBoxLayout, QTextEdit, QPushButton,
-    QLineEdit, QLabel, QTreeWidget, QTreeWidgetItem, QMenu, QCompleter
+    QLineEdit, QLabel, QTreeView, QMenu, QCompleter, QCheckBox,
+    QAbstractItemModel, QModelIndex, QTimer, QStringListModel,
+    QComboBox, QFileDialog, QPlainTextEdit, QTextCursor
 )
-from aqt.utils import showInfo
-from aqt.browser import Browser
+from aqt.utils import showInfo, askUser, tooltip
+from aqt.operations import CollectionOp, QueryOp
+from anki.collection import SearchNode
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFontDatabase, QFont
 from PyQt6.QtWidgets import (
     QAbstractItemView, QHeaderView
 )
+from .core import (
+    ExpansionState, load_settings, write_settings_file, write_file_atomically,
+    IncrementalOutline, enumerate_outline, enumerate_outline_entries,
+    replace_spaces_with_underscores,
+    SearchSuperseded, TagSnapshot,
+    merge_tags, compute_impact, note_ids_for_cards, apply_tags,
+    reparented_tag, reparent_problem, plan_renumber, renumber_op,
+    OperationLog, Span, set_operation_log,
+)
 
 ##############################################################################
 #                              SETTINGS                                      #
 ##############################################################################
 ADDON_NAME = "Bulk Create Subtags"
-ADDON_DIR = os.path.join(mw.pm.addonFolder(), ADDON_NAME)
-SETTINGS_FILE = os.path.join(ADDON_DIR, "bulk_subtags_settings.json")
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+# Settings live per profile in user_files, which survives add-on updates.
+USER_FILES_DIR = os.path.join(ADDON_DIR, "user_files")
+# Timing spans of user operations, see core.oplog.
+OPERATION_LOG_FILE = os.path.join(USER_FILES_DIR, "logs", "operations.jsonl")
+# cProfile and tracemalloc captures, taken when profiling is switched on.
+PROFILE_DIR = os.path.join(USER_FILES_DIR, "profiles")
+# Single settings file shared by all profiles in older versions. The first
+# profile opened takes it over, and it is then renamed so later profiles
+# start fresh.
+LEGACY_SETTINGS_FILE = os.path.join(ADDON_DIR, "bulk_subtags_settings.json")
+MIGRATED_SETTINGS_FILE = LEGACY_SETTINGS_FILE + ".migrated"
+
+def settings_file_for_profile():
+    # Each Anki profile has exactly one collection, so the profile name
+    # keys the collection's settings.
+    return os.path.join(USER_FILES_DIR, f"{mw.pm.name}.json")
+
+_settings = None
+_settings_file = None
+
+def get_settings():
+    """Returns the current profile's settings, loading them on first use."""
+    global _settings, _settings_file
+    if _settings is None:
+        _settings_file = settings_file_for_profile()
+        migrating = (not os.path.exists(_settings_file)
+                     and os.path.exists(LEGACY_SETTINGS_FILE))
+        data = load_settings(LEGACY_SETTINGS_FILE if migrating else _settings_file)
+        data["expanded"] = ExpansionState.from_settings(data)
+        data.setdefault("explanationVisible", True)
+        data.setdefault("rollbackOnCancel", False)
+        data.setdefault("indentWidth", None)
+        data.setdefault("profileOperations", False)
+        _settings = data
+        if migrating:
+            try:
+                write_settings_file(_settings_file, data)
+                os.replace(LEGACY_SETTINGS_FILE, MIGRATED_SETTINGS_FILE)
+            except OSError as e:
+                print("Error migrating settings:", e)
+    return _settings
+
+def unload_settings():
+    """Writes out and forgets the current profile's settings."""
+    global _settings, _settings_file
+    flush_settings()
+    _settings = None
+    _settings_file = None
+
+# Settings changes are coalesced and written at most once per interval.
+SETTINGS_FLUSH_MS = 2000
+_pending_settings = None
+_flush_timer = None
 
-def load_settings():
-    if not os.path.exists(SETTINGS_FILE):
-        return {}
-    try:
-        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        print("Error loading settings:", e)
-        return {}
 
 def save_settings(data):
+    """Marks settings dirty; flush_settings() writes them out later."""
+    global _pending_settings, _flush_timer
+    _pending_settings = (_settings_file, data)
+    if _flush_timer is None:
+        _flush_timer = QTimer(mw)
+        _flush_timer.setSingleShot(True)
+        _flush_timer.setInterval(SETTINGS_FLUSH_MS)
+        _flush_timer.timeout.connect(flush_settings)
+    if not _flush_timer.isActive():
+        _flush_timer.start()
+
+def flush_settings():
+    global _pending_settings
+    if _flush_timer is not None:
+        _flush_timer.stop()
+    if _pending_settings is None:
+        return
+    (path, data), _pending_settings = _pending_settings, None
     try:
-        os.makedirs(os.path.dirname(SETTINGS_FILE), exist_ok=True)
-        with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        write_settings_file(path, data)
     except Exception as e:
         print("Error saving settings:", e)
-        pass
 
-settings = load_settings()
-if "expansions" not in settings:
-    settings["expansions"] = {}
-if "explanationVisible" not in settings:
-    settings["explanationVisible"] = True
 
 ##############################################################################
 #                          ORBITRON FONT LOADING                             #
 ##############################################################################
+# Registered on first use rather than at import, see ensure_initialised().
 orbitron_font = None
 orbitron_family = None
-try:
-    font_path = os.path.join(ADDON_DIR, "Orbitron-Regular.ttf")
-    if os.path.exists(font_path):
-        font_id = QFontDatabase.addApplicationFont(font_path)
-        if font_id != -1:
-            orbitron_family = QFontDatabase.applicationFontFamilies(font_id)[0]
-            orbitron_font = QFont(orbitron_family, 8)
-            # Set letter spacing to 150% for the main UI
-            orbitron_font.setLetterSpacing(QFont.SpacingType.PercentageSpacing, 150)
-except Exception as e:
-    print("Error loading Orbitron font:", e)
-    pass
+_font_loaded = False
+
+def load_orbitron_font():
+    global orbitron_font, orbitron_family, _font_loaded
+    if _font_loaded:
+        return
+    _font_loaded = True
+    try:
+        font_path = os.path.join(ADDON_DIR, "Orbitron-Regular.ttf")
+        if os.path.exists(font_path):
+            font_id = QFontDatabase.addApplicationFont(font_path)
+            if font_id != -1:
+                orbitron_family = QFontDatabase.applicationFontFamilies(font_id)[0]
+                orbitron_font = QFont(orbitron_family, 8)
+                # Set letter spacing to 150% for the main UI
+                orbitron_font.setLetterSpacing(QFont.SpacingType.PercentageSpacing, 150)
+    except Exception as e:
+        print("Error loading Orbitron font:", e)
 
 ##############################################################################
 #                     APPLY CUSTOM ORBITRON STYLE                            #
 ##############################################################################
+_orbitron_style = None
+
 def apply_orbitron_style(widget):
     """
     Applies a custom darker style to the widget.
     This uses Orbitron plus a unique dark look with deeper backgrounds,
     darker borders, and refined hover/pressed effects.
     """
-    base_style = f"""
+    global _orbitron_style
+    load_orbitron_font()
+    if _orbitron_style is None:
+        _orbitron_style = orbitron_stylesheet()
+    widget.setStyleSheet(_orbitron_style)
+    if orbitron_font:
+        widget.setFont(orbitron_font)
+
+def orbitron_stylesheet():
+    return f"""
     /* General Dialog styling */
     QDialog {{
       background-color: #1F1F1F;
@@ -80,7 +170,7 @@ def apply_orbitron_style(widget):
       border-radius: 8px;
     }}
     /* Orbitron font for core widgets */
-    QDialog, QWidget, QLineEdit, QPushButton, QTreeWidget, QLabel, QTextEdit {{
+    QDialog, QWidget, QLineEdit, QPushButton, QTreeView, QLabel, QTextEdit {{
       font-family: 'Orbitron', sans-serif;
       font-size: 8pt;
       letter-spacing: 1.8px;
@@ -107,17 +197,17 @@ def apply_orbitron_style(widget):
     QPushButton:pressed {{
       background-color: #24282B;
     }}
-    /* QTreeWidget styling */
-    QTreeWidget {{
+    /* QTreeView styling */
+    QTreeView {{
       background-color: #2D2F33;
       border: none;
       color: #DADADA;
     }}
-    QTreeWidget::item {{
+    QTreeView::item {{
       padding-top: 4px;
       padding-bottom: 4px;
     }}
-    QTreeWidget::item:selected {{
+    QTreeView::item:selected {{
       background-color: #444;
       color: #FFFFFF;
     }}
@@ -128,90 +218,148 @@ def apply_orbitron_style(widget):
       border: 1px solid #444;
     }}
     """
-    widget.setStyleSheet(base_style)
-    if orbitron_font:
-        widget.setFont(orbitron_font)
 
 ##############################################################################
 #                      HELPER FUNCTIONS FOR TAGS                             #
 ##############################################################################
-def get_all_tags():
-    try:
-        tags = mw.col.tags.all()
-        tags.sort()
-        return tags
-    except Exception as e:
-        print("Error retrieving tags:", e)
-        return []
-
-def replace_spaces_with_underscores(s: str) -> str:
-    return s.replace(" ", "_")
-
-def parse_indentation_level(line: str):
-    leading_spaces = 0
-    for ch in line:
-        if ch == ' ':
-            leading_spaces += 1
-        elif ch == '\t':
-            leading_spaces += 4
+# Choices offered in the dialog; None auto-detects the width.
+INDENT_CHOICES = [("Auto", None), ("2 spaces", 2), ("4 spaces", 4), ("8 spaces", 8)]
+
+# File dialog filter for the formats iter_outline_file understands.
+OUTLINE_FILE_FILTER = (
+    "Outlines (*.txt *.md *.markdown *.opml *.xml *.csv *.tsv);;All files (*)"
+)
+
+##############################################################################
+#                      SHARED TAG SNAPSHOT & TREE MODEL                      #
+##############################################################################
+_tag_snapshot = None
+
+def get_tag_snapshot():
+    global _tag_snapshot
+    if _tag_snapshot is None:
+        try:
+            tags = mw.col.tags.all()
+        except Exception as e:
+            print("Error retrieving tags:", e)
+            return TagSnapshot([])
+        _tag_snapshot = TagSnapshot(tags)
+    return _tag_snapshot
+
+def invalidate_tag_snapshot(*_args):
+    global _tag_snapshot
+    _tag_snapshot = None
+
+def on_operation_did_execute(changes, handler):
+    if changes.tag:
+        invalidate_tag_snapshot()
+
+class TagTreeModel(QAbstractItemModel):
+    """
+    Read-only, single column model over a TagTrie. Index internal pointers
+    hold the node id. When a layout from TagTrie.visible_layout is set only
+    its nodes are exposed.
+    """
+
+    def __init__(self, trie, parent=None):
+        super().__init__(parent)
+        self.trie = trie
+        # Qt only stores a pointer, so the int objects must be kept alive.
+        self._refs = [None] * len(trie.parent)
+        self._vis_children = None
+        self._vis_row = None
+
+    def _ref(self, node):
+        ref = self._refs[node]
+        if ref is None:
+            ref = self._refs[node] = int(node)
+        return ref
+
+    def nodeForIndex(self, index):
+        return index.internalPointer() if index.isValid() else 0
+
+    def indexForNode(self, node):
+        if node <= 0:
+            return QModelIndex()
+        if self._vis_row is not None:
+            row = self._vis_row.get(node)
+            if row is None:
+                return QModelIndex()
         else:
-            break
-    indent_level = leading_spaces // 4
-    to_remove = leading_spaces
-    actual_removed = 0
-    new_content = []
-    for ch in line:
-        if ch == ' ' and actual_removed < to_remove:
-            actual_removed += 1
-        elif ch == '\t' and actual_removed + 4 <= to_remove:
-            actual_removed += 4
+            row = self.trie.row[node]
+        return self.createIndex(row, 0, self._ref(node))
+
+    def setVisibleLayout(self, layout):
+        """
+        Restricts the model to a layout from TagTrie.visible_layout, or shows
+        everything for None. The layout is built beforehand, off the main
+        thread, so this only swaps it in.
+        """
+        self.beginResetModel()
+        if layout is None:
+            self._vis_children = None
+            self._vis_row = None
+        else:
+            self._vis_children, self._vis_row = layout
+        self.endResetModel()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if column != 0 or row < 0:
+            return QModelIndex()
+        p = self.nodeForIndex(parent)
+        if self._vis_children is not None:
+            siblings = self._vis_children.get(p, ())
+            if row >= len(siblings):
+                return QModelIndex()
+            node = siblings[row]
         else:
-            new_content.append(ch)
-    content = "".join(new_content).strip()
-    return indent_level, content
-
-def parse_indented_subtags_enumerate_all(lines):
-    counters = [0] * 50
-    levels = [None] * 50
-    results = []
-    for line in lines:
-        indent_level, raw_content = parse_indentation_level(line)
-        if not raw_content.strip():
-            continue
-        for i in range(indent_level + 1, len(counters)):
-            counters[i] = 0
-            levels[i] = None
-        counters[indent_level] += 1
-        content = replace_spaces_with_underscores(raw_content)
-        enumerated_name = f"{counters[indent_level]:02d}_{content}"
-        levels[indent_level] = enumerated_name
-        path_segments = [levels[i] for i in range(indent_level + 1) if levels[i]]
-        final_path = "::".join(path_segments)
-        results.append(final_path)
-    seen = set()
-    final = []
-    for r in results:
-        if r not in seen:
-            seen.add(r)
-            final.append(r)
-    return final
+            if row >= self.trie.child_count[p]:
+                return QModelIndex()
+            node = self.trie.child(p, row)
+        return self.createIndex(row, 0, self._ref(node))
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self.indexForNode(self.trie.parent[index.internalPointer()])
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        p = self.nodeForIndex(parent)
+        if self._vis_children is not None:
+            return len(self._vis_children.get(p, ()))
+        return self.trie.child_count[p]
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.trie.segment(node)
+        if role == Qt.ItemDataRole.UserRole:
+            return self.trie.path(node)
+        return None
 
 ##############################################################################
 #              HIERARCHICAL TAG TREE WIDGET & SELECTION DIALOG               #
 ##############################################################################
-class TagTreeWidget(QTreeWidget):
+class TagTreeWidget(QTreeView):
     def __init__(self, multi_select=False, parent=None):
         super().__init__(parent)
         self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectItems)
         self.setAccessibleName("Tag Tree")
         self.setToolTip("Select one or more tags from the hierarchical tree.")
         self.setStyleSheet("""
-        QTreeWidget::item {
+        QTreeView::item {
             /* Base item styling */
             padding: 4px 8px;
             transition: background-color 0.3s ease, color 0.3s ease;
         }
-        QTreeWidget::item:selected {
+        QTreeView::item:selected {
             /* Selected item styling */
             background-color: qlineargradient(
                 x1:0, y1:0, x2:1, y2:0,
@@ -223,7 +371,7 @@ class TagTreeWidget(QTreeWidget):
             border-radius: 8px;
             font-weight: bold;
         }
-        QTreeWidget::item:selected:focus {
+        QTreeView::item:selected:focus {
             /* Remove or restyle the black focus rectangle */
             outline: none;  /* Removes default dotted focus outline */
             border: 1px solid rgba(100, 150, 255, 0.5);
@@ -236,97 +384,109 @@ class TagTreeWidget(QTreeWidget):
             color: #4477cc;
             font-weight: bold;
         }
-        QTreeWidget:focus {
-            /* Prevent the QTreeWidget from showing an additional focus outline */
+        QTreeView:focus {
+            /* Prevent the QTreeView from showing an additional focus outline */
             outline: none;
         }
         """)
         self.setHeaderHidden(True)
-        self.setColumnCount(1)
+        self.setUniformRowHeights(True)
         header = self.header()
-        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
         header.setStretchLastSection(False)
+        self._restoring = False
+        self.snapshot = None
+        self.trie = None
+        self.expandedNodes = None
         self.populateTree()
-        self.collapseAll()
         self.applySavedExpansions()
         if multi_select:
             self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         else:
             self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
-        self.itemExpanded.connect(lambda i: self.onItemExpandedOrCollapsed(i, True))
-        self.itemCollapsed.connect(lambda i: self.onItemExpandedOrCollapsed(i, False))
+        self.expanded.connect(lambda i: self.onItemExpandedOrCollapsed(i, True))
+        self.collapsed.connect(lambda i: self.onItemExpandedOrCollapsed(i, False))
 
     def populateTree(self):
-        self.clear()
-        treeDict = {}
-        for tag in get_all_tags():
-            parts = tag.split("::")
-            current = treeDict
-            for part in parts:
-                current = current.setdefault(part, {})
-            current["_full"] = tag
-
-        def addItems(parent, subtree):
-            for key, value in subtree.items():
-                if key == "_full":
-                    continue
-                item = QTreeWidgetItem([key])
-                full_tag = value.get("_full", key)
-                item.setData(0, Qt.ItemDataRole.UserRole, full_tag)
-                if parent is None:
-                    self.addTopLevelItem(item)
-                else:
-                    parent.addChild(item)
-                addItems(item, value)
-
-        addItems(None, treeDict)
+        with profile_capture("tree_populate"), Span("tree_populate", rate="nodes") as span:
+            self.snapshot = get_tag_snapshot()
+            self.trie = self.snapshot.trie
+            self.setModel(TagTreeModel(self.trie, self))
+            # Forget expansions of tags that no longer exist, and resolve
+            # the rest to nodes once so filtering never looks paths up.
+            settings = get_settings()
+            nodes = {}
+
+            def exists(path):
+                node = nodes[path] = self.trie.find(path)
+                return node is not None
+
+            pruned = settings["expanded"].prune(exists)
+            if pruned:
+                save_settings(settings)
+            # Kept in step with the settings by onItemExpandedOrCollapsed.
+            self.expandedNodes = ExpansionState(nodes[path] for path in settings["expanded"])
+            span.set(tags=len(self.snapshot.tags), nodes=len(self.trie), pruned=pruned)
 
     def applySavedExpansions(self):
-        def walk(item):
-            full_tag = item.data(0, Qt.ItemDataRole.UserRole)
-            if full_tag:
-                is_expanded = settings["expansions"].get(full_tag, False)
-                item.setExpanded(is_expanded)
-            for i in range(item.childCount()):
-                walk(item.child(i))
-        for i in range(self.topLevelItemCount()):
-            walk(self.topLevelItem(i))
-
-    def onItemExpandedOrCollapsed(self, item, expanded):
-        full_tag = item.data(0, Qt.ItemDataRole.UserRole)
+        # Only expanded nodes are visited; the view never walks the tree.
+        model = self.model()
+        self._restoring = True
+        restored = 0
+        try:
+            with Span("expansion_restore", rate="expanded") as span:
+                for node in self.expandedNodes:
+                    index = model.indexForNode(node)
+                    if index.isValid():
+                        self.setExpanded(index, True)
+                        restored += 1
+                span.set(saved=len(self.expandedNodes), expanded=restored)
+        finally:
+            self._restoring = False
+
+    def onItemExpandedOrCollapsed(self, index, expanded):
+        if self._restoring:
+            return
+        full_tag = index.data(Qt.ItemDataRole.UserRole)
         if full_tag:
-            settings["expansions"][full_tag] = expanded
+            self.expandedNodes.set(index.internalPointer(), expanded)
+            settings = get_settings()
+            settings["expanded"].set(full_tag, expanded)
             save_settings(settings)
 
     def getSelectedTags(self):
-        selected = self.selectedItems()
-        return [itm.data(0, Qt.ItemDataRole.UserRole) for itm in selected if itm]
+        return [
+            idx.data(Qt.ItemDataRole.UserRole)
+            for idx in self.selectionModel().selectedIndexes()
+        ]
+
+    def searchTree(self, query, is_stale=None):
+        """
+        Computes the visible layout for query, see TagTrie.visible_layout.
+        Safe to call off the main thread.
+        """
+        with Span("search", query_length=len(query)) as span:
+            # The index is built on the first search, not when the dialog opens.
+            visible = self.snapshot.search_index.search(query, is_stale)
+            span.set(visible=len(visible) if visible is not None else len(self.trie))
+            return self.trie.visible_layout(visible, is_stale)
+
+    def applyFilter(self, layout):
+        # Resetting the model drops view state, so re-apply saved expansions,
+        # all with repaints suspended so the view updates once.
+        self.setUpdatesEnabled(False)
+        try:
+            with Span("search_apply", visible=len(layout[1]) if layout is not None else None):
+                self.model().setVisibleLayout(layout)
+                self.applySavedExpansions()
+        finally:
+            self.setUpdatesEnabled(True)
 
     def filterTree(self, query: str):
-        tokens = [t.strip().lower() for t in query.split() if t.strip()]
-
-        def matches(item) -> bool:
-            text = item.text(0).lower()
-            full_tag = (item.data(0, Qt.ItemDataRole.UserRole) or "").lower()
-            if not tokens:
-                return True
-            for tok in tokens:
-                if tok in text or tok in full_tag:
-                    return True
-            return False
-
-        def filterItem(item):
-            me = matches(item)
-            child_match = False
-            for i in range(item.childCount()):
-                if filterItem(item.child(i)):
-                    child_match = True
-            show_me = me or child_match
-            item.setHidden(not show_me)
-            return show_me
-
-        for i in range(self.topLevelItemCount()):
-            filterItem(self.topLevelItem(i))
+        self.applyFilter(self.searchTree(query))
+
+# Quiet period after the last keystroke before the tag tree is filtered.
+SEARCH_DEBOUNCE_MS = 150
 
 class TagSelectionDialog(QDialog):
     def __init__(self, multi_select=False, parent=None):
@@ -362,22 +522,105 @@ class TagSelectionDialog(QDialog):
         cancelBtn.clicked.connect(self.reject)
         apply_orbitron_style(self)
         self.setLayout(main_layout)
+        self._searchGeneration = 0
+        self._searchRunning = False
+        self._closed = False
+        self._searchTimer = QTimer(self)
+        self._searchTimer.setSingleShot(True)
+        self._searchTimer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._searchTimer.timeout.connect(self.runSearch)
         self.search_edit.textChanged.connect(self.onSearchChanged)
 
     def onSearchChanged(self, text):
-        self.tree.filterTree(text)
+        # Every keystroke supersedes any pass in flight and restarts the
+        # debounce, so only the input typed last is filtered.
+        self._searchGeneration += 1
+        self._searchTimer.start()
+
+    def runSearch(self):
+        if self._searchRunning:
+            # onSearchDone restarts the timer once the stale pass stops.
+            return
+        generation = self._searchGeneration
+        query = self.search_edit.text()
+        is_stale = lambda: generation != self._searchGeneration
+        self._searchRunning = True
+        mw.taskman.run_in_background(
+            lambda: self.tree.searchTree(query, is_stale),
+            lambda fut: self.onSearchDone(fut, generation),
+        )
+
+    def onSearchDone(self, future, generation):
+        self._searchRunning = False
+        if generation != self._searchGeneration:
+            if not self._closed:
+                self._searchTimer.start()
+            return
+        try:
+            layout = future.result()
+        except SearchSuperseded:
+            return
+        self.tree.applyFilter(layout)
+
+    def done(self, result):
+        self._closed = True
+        self._searchGeneration += 1
+        self._searchTimer.stop()
+        flush_settings()
+        super().done(result)
 
     def getSelectedTags(self):
         return self.tree.getSelectedTags()
 
+def document_line(block):
+    # toPlainText() turns no-break spaces into spaces; block.text() does not.
+    return block.text().replace("\xa0", " ")
+
+def iter_document_lines(document):
+    """The document's lines as toPlainText().splitlines() gives them."""
+    block = document.begin()
+    while block.isValid():
+        yield document_line(block)
+        block = block.next()
+
+class OutlineEdit(QTextEdit):
+    """
+    Plain text editor for outlines that keeps one line per text block, so
+    blocks can be read directly. Shift+Enter starts a new line rather than
+    inserting a line separator, and pasted or dropped text has its line
+    separators turned into line breaks.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAcceptRichText(False)
+
+    def keyPressEvent(self, event):
+        if (
+            event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter)
+            and event.modifiers() & Qt.KeyboardModifier.ShiftModifier
+        ):
+            self.insertPlainText("\n")
+            return
+        super().keyPressEvent(event)
+
+    def insertFromMimeData(self, source):
+        if source.hasText():
+            text = source.text().replace("\u2028", "\n").replace("\u2029", "\n")
+            self.insertPlainText(text.replace("\xa0", " "))
+            return
+        super().insertFromMimeData(source)
+
 ##############################################################################
 #                          BULK SUBTAG DIALOG                                #
 ##############################################################################
 class BulkSubtagDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, note_ids=None):
         super().__init__(parent)
+        self.note_ids = note_ids or []
         self.setWindowTitle("Bulk Create Subtags")
         self.resize(600, 400)
+        self._data = None
         layout = QVBoxLayout(self)
 
         # Parent tag input layout
@@ -386,11 +629,16 @@ class BulkSubtagDialog(QDialog):
         self.parentTagEdit.setPlaceholderText("Enter or select parent tag (optional)")
         self.parentTagEdit.setAccessibleName("Parent Tag Input")
         self.parentTagEdit.setToolTip("You may type a parent tag manually or click the button to select one.")
-        all_tags = get_all_tags()
-        self.completer = QCompleter(all_tags)
-        self.completer.setCaseSensitivity(Qt.CaseInsensitive)
-        self.completer.setFilterMode(Qt.MatchContains)
-        self.parentTagEdit.setCompleter(self.completer)
+        # The completer shows whatever the shared index ranked for the
+        # current text, so Qt never filters the tag list itself.
+        self.completionModel = QStringListModel(self)
+        self.completer = QCompleter(self.completionModel, self)
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.completer.setMaxVisibleItems(12)
+        self.completer.setWidget(self.parentTagEdit)
+        self.completer.activated[str].connect(self.parentTagEdit.setText)
+        self.parentTagEdit.textEdited.connect(self.updateCompletions)
+        load_orbitron_font()
         if orbitron_family:
             orbitron_completer_font = QFont(orbitron_family, 8)
             orbitron_completer_font.setLetterSpacing(QFont.SpacingType.PercentageSpacing, 130)
@@ -409,11 +657,16 @@ class BulkSubtagDialog(QDialog):
         parent_layout.addWidget(QLabel("<b>Parent Tag:</b>", self))
         parent_layout.addWidget(self.parentTagEdit)
         parent_layout.addWidget(select_button)
+        move_button = QPushButton("Move...", self)
+        move_button.setAccessibleName("Move Parent Tag Subtree")
+        move_button.setToolTip("Move this tag and everything below it under a different parent, in one step.")
+        move_button.clicked.connect(self.openReparent)
+        parent_layout.addWidget(move_button)
         layout.addLayout(parent_layout)
 
         # Toggle explanation section
         self.toggleButton = QPushButton(self)
-        explanation_visible = settings.get("explanationVisible", True)
+        explanation_visible = get_settings().get("explanationVisible", True)
         self.toggleButton.setText("Hide Explanation" if explanation_visible else "Show Explanation")
         self.toggleButton.setAccessibleName("Toggle Explanation Visibility")
         self.toggleButton.setToolTip("Click to show or hide the explanation for subtag formatting.")
@@ -423,7 +676,8 @@ class BulkSubtagDialog(QDialog):
         label_text = (
             "<b>Subtags:</b><br>"
             "Each line is enumerated at its indentation level (01_, 02_, etc.).<br>"
-            "Indentation = multiples of 4 spaces or 1 tab => deeper level.<br><br>"
+            "Indentation = 1 tab or the chosen number of spaces => deeper level "
+            "(Auto uses the first line indented with spaces).<br><br>"
             "<b>Example:</b><br>"
             "01_Main_Tag<br>"
             "&nbsp;&nbsp;&nbsp;&nbsp;01_Subtag<br>"
@@ -440,11 +694,70 @@ class BulkSubtagDialog(QDialog):
         layout.addWidget(self.explanationLabel)
 
         # Subtags text edit area
-        self.subtagsEdit = QTextEdit(self)
+        self.subtagsEdit = OutlineEdit(self)
         self.subtagsEdit.setPlaceholderText("Paste or type your lines here...")
         self.subtagsEdit.setAccessibleName("Subtags Input Area")
         self.subtagsEdit.setToolTip("Type or paste your subtag lines here. Each line with proper indentation will be enumerated.")
-        layout.addWidget(self.subtagsEdit)
+        # Live preview of the enumerated tags, one line per input line
+        self.previewEdit = QPlainTextEdit(self)
+        self.previewEdit.setReadOnly(True)
+        self.previewEdit.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.previewEdit.setPlaceholderText("Enumerated subtags appear here as you type.")
+        self.previewEdit.setAccessibleName("Subtags Preview")
+        self.previewEdit.setToolTip("Preview of the enumerated subtags, updated as you edit.")
+        self.previewLabel = QLabel(self)
+        preview_layout = QVBoxLayout()
+        preview_layout.addWidget(self.previewEdit)
+        preview_layout.addWidget(self.previewLabel)
+        editor_layout = QHBoxLayout()
+        editor_layout.addWidget(self.subtagsEdit)
+        editor_layout.addLayout(preview_layout)
+        layout.addLayout(editor_layout)
+
+        # Import an outline file instead of the text above
+        import_layout = QHBoxLayout()
+        self.importPath = None
+        self.importButton = QPushButton("Import from File...", self)
+        self.importButton.setAccessibleName("Import Outline File")
+        self.importButton.setToolTip("Use an outline file (text, Markdown, OPML or CSV) instead of the text above. The file is read while applying, without loading it here.")
+        self.importButton.clicked.connect(self.chooseImportFile)
+        self.importLabel = QLabel(self)
+        self.clearImportButton = QPushButton("Clear", self)
+        self.clearImportButton.setAccessibleName("Clear Outline File")
+        self.clearImportButton.setToolTip("Go back to using the text above.")
+        self.clearImportButton.clicked.connect(lambda: self.setImportPath(None))
+        import_layout.addWidget(self.importButton)
+        import_layout.addWidget(self.importLabel, 1)
+        import_layout.addWidget(self.clearImportButton)
+        layout.addLayout(import_layout)
+        self.setImportPath(None)
+
+        # Spaces per indentation level; tabs always count as one level
+        indent_layout = QHBoxLayout()
+        self.indentCombo = QComboBox(self)
+        for label, width in INDENT_CHOICES:
+            self.indentCombo.addItem(label, width)
+        saved_width = get_settings().get("indentWidth")
+        self.indentCombo.setCurrentIndex(max(0, self.indentCombo.findData(saved_width)))
+        self.indentCombo.setAccessibleName("Indentation Width")
+        self.indentCombo.setToolTip("How many spaces make one indentation level. Auto detects it from the outline.")
+        self.indentCombo.currentIndexChanged.connect(self.changeIndentWidth)
+        indent_layout.addWidget(QLabel("Indentation:", self))
+        indent_layout.addWidget(self.indentCombo)
+        indent_layout.addStretch()
+        layout.addLayout(indent_layout)
+
+        self.outline = IncrementalOutline(self.indentCombo.currentData())
+        self.subtagsEdit.document().contentsChange.connect(self.onSubtagsChanged)
+        self.updatePreviewLabel()
+
+        # What to do with already-tagged notes if the apply is cancelled
+        self.rollbackCheck = QCheckBox("Undo all changes if cancelled", self)
+        self.rollbackCheck.setChecked(get_settings().get("rollbackOnCancel", False))
+        self.rollbackCheck.setAccessibleName("Rollback On Cancel")
+        self.rollbackCheck.setToolTip("When checked, cancelling a running apply reverts the notes tagged so far. Otherwise they stay tagged.")
+        self.rollbackCheck.toggled.connect(self.toggleRollbackOnCancel)
+        layout.addWidget(self.rollbackCheck)
 
         # OK / Cancel buttons layout
         btnLayout = QHBoxLayout()
@@ -455,6 +768,11 @@ class BulkSubtagDialog(QDialog):
         self.cancelButton = QPushButton("Cancel", self)
         self.cancelButton.setAccessibleName("Cancel Bulk Subtags")
         self.cancelButton.setToolTip("Press to cancel this operation, closing the dialog.")
+        self.dryRunButton = QPushButton("Dry Run", self)
+        self.dryRunButton.setAccessibleName("Dry Run Bulk Subtags")
+        self.dryRunButton.setToolTip("Show how many notes and tags would change, without changing anything.")
+        self.dryRunButton.clicked.connect(self.showDryRun)
+        btnLayout.addWidget(self.dryRunButton)
         btnLayout.addWidget(self.okButton)
         btnLayout.addWidget(self.cancelButton)
         layout.addLayout(btnLayout)
@@ -469,85 +787,725 @@ class BulkSubtagDialog(QDialog):
         newVisible = not isVisible
         self.explanationLabel.setVisible(newVisible)
         self.toggleButton.setText("Hide Explanation" if newVisible else "Show Explanation")
+        settings = get_settings()
         settings["explanationVisible"] = newVisible
         save_settings(settings)
 
+    def done(self, result):
+        flush_settings()
+        super().done(result)
+
+    def updateCompletions(self, text):
+        matches = get_tag_snapshot().completion_index.complete(text)
+        self.completionModel.setStringList(matches)
+        if matches:
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    def chooseImportFile(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Outline", "", OUTLINE_FILE_FILTER)
+        if path:
+            self.setImportPath(path)
+
+    def setImportPath(self, path):
+        self.importPath = path
+        self.importLabel.setText(os.path.basename(path) if path else "")
+        self.clearImportButton.setVisible(bool(path))
+        self.subtagsEdit.setEnabled(not path)
+        self.previewEdit.setEnabled(not path)
+
+    def onSubtagsChanged(self, position, removed, added):
+        # Map the character range Qt reports onto whole lines and hand only
+        # those to the incremental outline.
+        doc = self.subtagsEdit.document()
+        block = doc.findBlock(position)
+        last = doc.findBlock(position + added)
+        last_number = last.blockNumber() if last.isValid() else doc.blockCount() - 1
+        new_lines = []
+        while block.isValid() and block.blockNumber() <= last_number:
+            new_lines.append(document_line(block))
+            block = block.next()
+        first = last_number - len(new_lines) + 1
+        removed_lines = len(self.outline) - (doc.blockCount() - len(new_lines))
+        if removed_lines < 0 or first + removed_lines > len(self.outline):
+            # Out of step; resynchronise the whole document.
+            first, removed_lines = 0, len(self.outline)
+            new_lines = list(iter_document_lines(doc))
+        self.showPreviewChange(self.outline.replace_lines(first, removed_lines, new_lines))
+
+    def showPreviewChange(self, change):
+        start, old_stop, new_stop = change
+        texts = [self.outline.display(i) for i in range(start, new_stop)]
+        doc = self.previewEdit.document()
+        cursor = QTextCursor(doc)
+        cursor.beginEditBlock()
+        if old_stop > start:
+            first = doc.findBlockByNumber(start)
+            last = doc.findBlockByNumber(old_stop - 1)
+            cursor.setPosition(first.position())
+            cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+            if texts:
+                cursor.insertText("\n".join(texts))
+            else:
+                # Remove the lines together with one line break.
+                if last.next().isValid():
+                    cursor.setPosition(last.next().position(), QTextCursor.MoveMode.KeepAnchor)
+                elif start > 0:
+                    cursor.setPosition(first.position() - 1)
+                    cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+                cursor.removeSelectedText()
+        elif texts:
+            block = doc.findBlockByNumber(start)
+            if block.isValid():
+                cursor.setPosition(block.position())
+                cursor.insertText("\n".join(texts) + "\n")
+            else:
+                cursor.movePosition(QTextCursor.MoveOperation.End)
+                cursor.insertText("\n" + "\n".join(texts))
+        cursor.endEditBlock()
+        self.updatePreviewLabel()
+
+    def updatePreviewLabel(self):
+        self.previewLabel.setText(f"{self.outline.tag_count:,} subtags")
+
+    def showDryRun(self):
+        full_tags = self.getData([])
+        if full_tags is None:
+            return
+        if not full_tags:
+            showInfo("No subtags provided.", parent=self)
+            return
+        note_ids = self.note_ids
+        collection_tags_lower = get_tag_snapshot().lower_tags
+        def op(col):
+            with Span("dry_run", rate="notes", notes=len(note_ids)):
+                return compute_impact(col, note_ids, full_tags, collection_tags_lower)
+
+        QueryOp(
+            parent=self,
+            op=op,
+            success=lambda report: showInfo(format_impact(report), parent=self, textFormat="rich"),
+        ).with_progress("Computing dry run...").run_in_background()
+
+    def changeIndentWidth(self, index):
+        self.showPreviewChange(self.outline.set_indent_width(self.indentCombo.itemData(index)))
+        settings = get_settings()
+        settings["indentWidth"] = self.indentCombo.itemData(index)
+        save_settings(settings)
+
+    def accept(self):
+        errors = []
+        self._data = self.getData(errors)
+        if self._data is None:
+            return
+        if errors:
+            shown = "\n".join(f"Line {line}: {message}" for line, message in errors[:10])
+            more = f"\n...and {len(errors) - 10} more." if len(errors) > 10 else ""
+            if not askUser(f"The outline has indentation problems:\n\n{shown}{more}\n\nContinue anyway?", parent=self):
+                return
+        super().accept()
+
+    def toggleRollbackOnCancel(self, checked):
+        settings = get_settings()
+        settings["rollbackOnCancel"] = checked
+        save_settings(settings)
+
     def open_tag_selection(self):
-        dlg = TagSelectionDialog(multi_select=False, parent=self)
+        with Span("tag_selector_open"):
+            dlg = TagSelectionDialog(multi_select=False, parent=self)
         if dlg.exec() == QDialog.DialogCode.Accepted:
             selected = dlg.getSelectedTags()
             if selected:
                 self.parentTagEdit.setText(selected[0])
 
-    def getData(self):
+    def openReparent(self):
+        current = replace_spaces_with_underscores(self.parentTagEdit.text().strip())
+        dlg = ReparentDialog(current, self)
+        if dlg.exec() != QDialog.DialogCode.Accepted:
+            return
+        old, new = dlg.source(), dlg.target()
+
+        def on_success(out):
+            if current == old:
+                self.parentTagEdit.setText(new)
+            showInfo(f"Moved {old} to {new} on {out.count:,} notes.", parent=self)
+
+        def op(col):
+            with Span("move_subtree") as span:
+                # One backend rename moves the whole subtree.
+                out = col.tags.rename(old, new)
+                span.set(notes=out.count)
+            return out
+
+        CollectionOp(parent=self, op=op).success(on_success).run_in_background()
+
+    def getData(self, errors=None):
+        """
+        The enumerated tags under the parent tag, or None if the import file
+        could not be read (the user has been told why).
+        """
+        if errors is None and self._data is not None:
+            return self._data
         parentTag = replace_spaces_with_underscores(self.parentTagEdit.text().strip())
-        lines = self.subtagsEdit.toPlainText().splitlines()
-        enumerated_paths = parse_indented_subtags_enumerate_all(lines)
-        final_tags = []
-        for path in enumerated_paths:
-            if parentTag:
-                final_tags.append(f"{parentTag}::{path}")
-            else:
-                final_tags.append(path)
-        return final_tags
+        indent_width = self.indentCombo.currentData()
+
+        def prefixed(enumerated_paths, source):
+            final_tags = []
+            with Span("parse", rate="tags", source=source) as span:
+                for path in enumerated_paths:
+                    if parentTag:
+                        final_tags.append(f"{parentTag}::{path}")
+                    else:
+                        final_tags.append(path)
+                span.set(tags=len(final_tags))
+            return final_tags
+
+        if self.importPath:
+            # The file readers and the csv and ElementTree modules behind them
+            # are only loaded once a file is imported.
+            import csv
+            from xml.etree import ElementTree
+            from .core.outline_files import iter_outline_file
+            try:
+                return prefixed(enumerate_outline_entries(
+                    iter_outline_file(self.importPath, indent_width, errors)
+                ), "file")
+            except (OSError, UnicodeDecodeError, csv.Error, ElementTree.ParseError) as e:
+                showInfo(f"Could not read {self.importPath}:\n{e}", parent=self)
+                return None
+        # Read the document block by block rather than copying it twice
+        # through toPlainText().splitlines().
+        return prefixed(enumerate_outline(
+            iter_document_lines(self.subtagsEdit.document()), indent_width, errors
+        ), "editor")
 
 ##############################################################################
 #            APPLY SUBTAGS TO SELECTED CARDS FROM THE BROWSER              #
 ##############################################################################
+def format_impact(report):
+    return (
+        "<b>Dry run</b> (nothing has been changed)<br><br>"
+        f"Notes selected: {report.notes_selected:,}<br>"
+        f"Notes that would change: {report.notes_affected:,}<br>"
+        f"Notes that already have every tag: {report.notes_unchanged:,}<br><br>"
+        f"Subtags: {report.tags_total:,}, of which new to the collection: {report.tags_new:,}<br>"
+        f"Tag additions across notes: {report.tag_additions:,}<br>"
+        f"Estimated tag data written: {report.bytes_written / 1024:,.1f} KiB"
+    )
+
+def report_apply_progress(done, total, started):
+    elapsed = time.monotonic() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate else 0.0
+    label = (
+        f"Tagged {done:,} / {total:,} notes\n"
+        f"{rate:,.0f} notes/sec, about {eta:,.0f}s left (Esc to cancel)"
+    )
+    mw.taskman.run_on_main(
+        lambda: mw.progress.update(label=label, value=done, max=total)
+    )
+
+def apply_subtags_op(col, note_ids, space_separated_tags, rollback_on_cancel,
+                     parent_span=None, capture=None):
+    """
+    Runs in the background, reporting progress to the progress window and
+    stopping between chunks when the user cancels.
+    """
+    with capture or contextlib.nullcontext(), Span("apply", rate="notes", parent=parent_span) as span:
+        result = apply_tags(
+            col, note_ids, space_separated_tags, rollback_on_cancel,
+            want_cancel=mw.progress.want_cancel,
+            on_progress=report_apply_progress,
+        )
+        span.set(
+            notes=result.notes_processed,
+            notes_changed=result.notes_changed,
+            tags=len(space_separated_tags.split()),
+            cancelled=result.cancelled,
+            rolled_back=result.rolled_back,
+        )
+    return result
+
+def show_apply_result(result):
+    if result.rolled_back:
+        showInfo("Cancelled. No tags were changed.")
+    elif result.cancelled:
+        showInfo(
+            f"Cancelled after {result.notes_processed:,} of {result.notes_total:,} notes. "
+            f"Subtags were added to {result.notes_changed:,} notes."
+        )
+    else:
+        showInfo(f"Subtags added to {result.notes_changed:,} notes.")
+
 def add_subtags_to_cards(browser):
     card_ids = browser.selectedCards()
     if not card_ids:
         showInfo("No cards selected. Please select cards in the browser.")
         return
-    dlg = BulkSubtagDialog(browser)
+    with profile_capture("dialog_open"):
+        with Span("notes_for_cards", cards=len(card_ids)) as span:
+            # Notes with several selected cards are only touched once.
+            note_ids = note_ids_for_cards(browser.mw.col, card_ids)
+            span.set(notes=len(note_ids))
+        with Span("dialog_open"):
+            dlg = BulkSubtagDialog(browser, note_ids)
     if dlg.exec() == QDialog.DialogCode.Accepted:
         full_tags = dlg.getData()
         if not full_tags:
             showInfo("No subtags provided.")
             return
-        for cid in card_ids:
-            card = browser.mw.col.getCard(cid)
-            note = card.note()
-            # Handle tags stored as either list or string format
-            if isinstance(note.tags, list):
-                current_tags = note.tags
-            else:
-                current_tags = note.tags.split()
-            for new_tag in full_tags:
-                if new_tag not in current_tags:
-                    current_tags.append(new_tag)
-            if isinstance(note.tags, list):
-                note.tags = current_tags
-            else:
-                note.tags = " ".join(current_tags)
-            note.flush()
-        browser.mw.col.save()
-        showInfo("Subtags added to selected cards.")
+        # Remembered for renumbering, once the apply has gone through.
+        outline = None if dlg.importPath else (
+            replace_spaces_with_underscores(dlg.parentTagEdit.text().strip()),
+            dlg.subtagsEdit.toPlainText(),
+            dlg.indentCombo.currentData(),
+        )
+
+        def on_success(result):
+            if outline is not None and not result.rolled_back:
+                remember_outline(*outline)
+            show_apply_result(result)
+
+        with Span("apply_prepare", tags=len(full_tags)) as prepare_span:
+            unique_tags, _ = merge_tags([], full_tags)
+            space_separated_tags = " ".join(unique_tags)
+        rollback_on_cancel = get_settings().get("rollbackOnCancel", False)
+        # Decided here; the capture itself runs on the background thread.
+        capture = profile_capture("apply")
+        CollectionOp(
+            parent=browser,
+            op=lambda col: apply_subtags_op(
+                col, note_ids, space_separated_tags, rollback_on_cancel,
+                prepare_span, capture,
+            ),
+        ).success(on_success).run_in_background()
+
+##############################################################################
+#                     MOVE A SUBTREE UNDER ANOTHER PARENT                    #
+##############################################################################
+def count_notes_with_tag(col, tag):
+    """Notes carrying tag or any tag below it."""
+    return len(col.find_notes(col.build_search_string(SearchNode(tag=tag))))
+
+class ReparentDialog(QDialog):
+    def __init__(self, source="", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Move Subtree")
+        self.resize(550, 200)
+        layout = QVBoxLayout(self)
+
+        self.sourceEdit = self.addTagRow(layout, "Move:", source, "Tag to Move",
+                                         "The tag to move. Everything below it moves too.")
+        self.targetEdit = self.addTagRow(layout, "Under:", "", "New Parent Tag",
+                                         "The new parent. Leave empty to move the subtree to the top level.")
+        self.summaryLabel = QLabel(self)
+        self.summaryLabel.setWordWrap(True)
+        layout.addWidget(self.summaryLabel)
+        self.sourceEdit.textChanged.connect(self.clearSummary)
+        self.targetEdit.textChanged.connect(self.clearSummary)
+
+        btnLayout = QHBoxLayout()
+        previewButton = QPushButton("Preview", self)
+        previewButton.setAccessibleName("Preview Move")
+        previewButton.setToolTip("Show the new tag name and how many notes would change.")
+        previewButton.clicked.connect(self.showPreview)
+        okButton = QPushButton("Move", self)
+        okButton.setAccessibleName("Confirm Move")
+        okButton.setToolTip("Rename the subtree in one step (Ctrl+Enter).")
+        okButton.setShortcut("Ctrl+Return")
+        cancelButton = QPushButton("Cancel", self)
+        cancelButton.setAccessibleName("Cancel Move")
+        cancelButton.setToolTip("Close without changing anything.")
+        btnLayout.addWidget(previewButton)
+        btnLayout.addWidget(okButton)
+        btnLayout.addWidget(cancelButton)
+        layout.addLayout(btnLayout)
+
+        okButton.clicked.connect(self.accept)
+        cancelButton.clicked.connect(self.reject)
+        self.setLayout(layout)
+        apply_orbitron_style(self)
+
+    def addTagRow(self, layout, label, text, accessible_name, tooltip):
+        row = QHBoxLayout()
+        edit = QLineEdit(text, self)
+        edit.setAccessibleName(accessible_name)
+        edit.setToolTip(tooltip)
+        select_button = QPushButton("Select Tag", self)
+        select_button.setAccessibleName(f"Select {accessible_name}")
+        select_button.setToolTip("Click here to open a tag selector dialog.")
+        select_button.clicked.connect(lambda: self.open_tag_selection(edit))
+        row.addWidget(QLabel(f"<b>{label}</b>", self))
+        row.addWidget(edit)
+        row.addWidget(select_button)
+        layout.addLayout(row)
+        return edit
+
+    def open_tag_selection(self, edit):
+        with Span("tag_selector_open"):
+            dlg = TagSelectionDialog(multi_select=False, parent=self)
+        if dlg.exec() == QDialog.DialogCode.Accepted:
+            selected = dlg.getSelectedTags()
+            if selected:
+                edit.setText(selected[0])
+
+    def source(self):
+        return replace_spaces_with_underscores(self.sourceEdit.text().strip())
+
+    def target(self):
+        return reparented_tag(self.source(), replace_spaces_with_underscores(self.targetEdit.text().strip()))
+
+    def problem(self):
+        return reparent_problem(
+            self.source(), replace_spaces_with_underscores(self.targetEdit.text().strip())
+        )
+
+    def clearSummary(self):
+        self.summaryLabel.clear()
+
+    def showPreview(self):
+        problem = self.problem()
+        if problem:
+            self.summaryLabel.setText(problem)
+            return
+        source, target = self.source(), self.target()
+        QueryOp(
+            parent=self,
+            op=lambda col: (count_notes_with_tag(col, source), count_notes_with_tag(col, target)),
+            success=lambda counts: self.summaryLabel.setText(
+                f"{source} → {target}<br>"
+                f"{counts[0]:,} notes would change."
+                + (f"<br>{target} already exists on {counts[1]:,} notes and would be merged."
+                   if counts[1] else "")
+            ),
+        ).run_in_background()
+
+    def accept(self):
+        problem = self.problem()
+        if problem:
+            showInfo(problem, parent=self)
+            return
+        super().accept()
+
+##############################################################################
+#                 RENUMBER SUBTAGS AFTER AN OUTLINE CHANGE                   #
+##############################################################################
+# Outlines remembered per parent tag, with the indentation width they were
+# applied with, to prefill the renumber dialog. Each is its own file, so
+# they never weigh on settings writes; the least recently written are
+# dropped past the limit.
+OUTLINE_MEMORY_DIR = os.path.join(USER_FILES_DIR, "outlines")
+OUTLINE_MEMORY_LIMIT = 20
+OUTLINE_MEMORY_MAX_CHARS = 200_000
+
+def outline_memory_file(parent_tag):
+    # Tags may hold characters that are not allowed in file names.
+    digest = hashlib.sha1(parent_tag.encode("utf-8")).hexdigest()
+    return os.path.join(OUTLINE_MEMORY_DIR, mw.pm.name, f"{digest}.json")
+
+def remember_outline(parent_tag, text, indent_width):
+    """Stores the outline last applied under parent_tag and its indent width."""
+    if len(text) > OUTLINE_MEMORY_MAX_CHARS:
+        return
+    path = outline_memory_file(parent_tag)
+    try:
+        write_file_atomically(path, json.dumps({"indentWidth": indent_width, "outline": text}))
+        directory = os.path.dirname(path)
+        files = sorted(
+            (entry for entry in os.scandir(directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in files[:-OUTLINE_MEMORY_LIMIT]:
+            os.remove(entry.path)
+    except OSError as e:
+        print("Error saving outline:", e)
+
+def remembered_outline(parent_tag):
+    """(text, indent_width) remembered for parent_tag, or None."""
+    try:
+        with open(outline_memory_file(parent_tag), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data["outline"], data["indentWidth"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+class RenumberDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Renumber Subtags")
+        self.resize(700, 500)
+        layout = QVBoxLayout(self)
+
+        parent_layout = QHBoxLayout()
+        self.parentTagEdit = QLineEdit(self)
+        self.parentTagEdit.setPlaceholderText("Parent tag the outline was applied under (optional)")
+        self.parentTagEdit.setAccessibleName("Parent Tag Input")
+        self.parentTagEdit.setToolTip("The same parent tag that was used when the subtags were created.")
+        self.parentTagEdit.editingFinished.connect(self.loadRememberedOutline)
+        select_button = QPushButton("Select Tag", self)
+        select_button.setAccessibleName("Select Parent Tag")
+        select_button.setToolTip("Click here to open a tag selector dialog.")
+        select_button.clicked.connect(self.open_tag_selection)
+        parent_layout.addWidget(QLabel("<b>Parent Tag:</b>", self))
+        parent_layout.addWidget(self.parentTagEdit)
+        parent_layout.addWidget(select_button)
+        layout.addLayout(parent_layout)
+
+        outlines_layout = QHBoxLayout()
+        old_layout = QVBoxLayout()
+        old_layout.addWidget(QLabel("<b>Previous outline:</b>", self))
+        self.oldEdit = OutlineEdit(self)
+        self.oldEdit.setAccessibleName("Previous Outline")
+        self.oldEdit.setToolTip("The outline the existing subtags were created from. Filled in automatically when it is remembered for this parent tag.")
+        old_layout.addWidget(self.oldEdit)
+        new_layout = QVBoxLayout()
+        new_layout.addWidget(QLabel("<b>New outline:</b>", self))
+        self.newEdit = OutlineEdit(self)
+        self.newEdit.setAccessibleName("New Outline")
+        self.newEdit.setToolTip("The edited outline. Existing subtags are renamed to match its numbering.")
+        new_layout.addWidget(self.newEdit)
+        outlines_layout.addLayout(old_layout)
+        outlines_layout.addLayout(new_layout)
+        layout.addLayout(outlines_layout)
+
+        # Both outlines are read with this width. It starts at the global
+        # choice and follows a remembered outline when one is loaded.
+        indent_layout = QHBoxLayout()
+        self.indentCombo = QComboBox(self)
+        for label, width in INDENT_CHOICES:
+            self.indentCombo.addItem(label, width)
+        saved_width = get_settings().get("indentWidth")
+        self.indentCombo.setCurrentIndex(max(0, self.indentCombo.findData(saved_width)))
+        self.indentCombo.setAccessibleName("Indentation Width")
+        self.indentCombo.setToolTip("How many spaces make one indentation level in both outlines. Set to the width the previous outline was applied with when it is remembered.")
+        indent_layout.addWidget(QLabel("Indentation:", self))
+        indent_layout.addWidget(self.indentCombo)
+        indent_layout.addStretch()
+        layout.addLayout(indent_layout)
+
+        self.removeCheck = QCheckBox("Remove tags for lines deleted from the outline", self)
+        self.removeCheck.setAccessibleName("Remove Deleted Subtags")
+        self.removeCheck.setToolTip("When checked, subtags whose line no longer exists are removed from all notes.")
+        layout.addWidget(self.removeCheck)
+
+        self.summaryLabel = QLabel(self)
+        self.summaryLabel.setWordWrap(True)
+        layout.addWidget(self.summaryLabel)
+
+        btnLayout = QHBoxLayout()
+        previewButton = QPushButton("Preview", self)
+        previewButton.setAccessibleName("Preview Renumbering")
+        previewButton.setToolTip("Show which tags would be renamed or removed.")
+        previewButton.clicked.connect(self.showPlan)
+        okButton = QPushButton("Renumber", self)
+        okButton.setAccessibleName("Confirm Renumbering")
+        okButton.setToolTip("Rename the existing subtags to match the new outline (Ctrl+Enter).")
+        okButton.setShortcut("Ctrl+Return")
+        cancelButton = QPushButton("Cancel", self)
+        cancelButton.setAccessibleName("Cancel Renumbering")
+        cancelButton.setToolTip("Close without changing anything.")
+        btnLayout.addWidget(previewButton)
+        btnLayout.addWidget(okButton)
+        btnLayout.addWidget(cancelButton)
+        layout.addLayout(btnLayout)
+
+        okButton.clicked.connect(self.accept)
+        cancelButton.clicked.connect(self.reject)
+        self.setLayout(layout)
+        apply_orbitron_style(self)
+
+    def parentTag(self):
+        return replace_spaces_with_underscores(self.parentTagEdit.text().strip())
+
+    def loadRememberedOutline(self):
+        remembered = remembered_outline(self.parentTag())
+        if remembered is not None and not self.oldEdit.toPlainText().strip():
+            text, indent_width = remembered
+            self.oldEdit.setPlainText(text)
+            self.indentCombo.setCurrentIndex(max(0, self.indentCombo.findData(indent_width)))
+            if not self.newEdit.toPlainText().strip():
+                self.newEdit.setPlainText(text)
+
+    def open_tag_selection(self):
+        with Span("tag_selector_open"):
+            dlg = TagSelectionDialog(multi_select=False, parent=self)
+        if dlg.exec() == QDialog.DialogCode.Accepted:
+            selected = dlg.getSelectedTags()
+            if selected:
+                self.parentTagEdit.setText(selected[0])
+                self.loadRememberedOutline()
+
+    def enumeratedPaths(self, edit):
+        indent_width = self.indentCombo.currentData()
+        return list(enumerate_outline(iter_document_lines(edit.document()), indent_width))
+
+    def plan(self):
+        renames, removals, skipped = plan_renumber(
+            self.enumeratedPaths(self.oldEdit), self.enumeratedPaths(self.newEdit),
+            self.parentTag(),
+        )
+        if not self.removeCheck.isChecked():
+            removals = []
+        return renames, removals, skipped
+
+    def showPlan(self):
+        renames, removals, skipped = self.plan()
+        lines = [f"{old} → {new}" for old, new in renames[:15]]
+        if len(renames) > 15:
+            lines.append(f"...and {len(renames) - 15} more renames")
+        lines += [f"remove {tag}" for tag in removals[:5]]
+        if len(removals) > 5:
+            lines.append(f"...and {len(removals) - 5} more removals")
+        lines += [f"left out {key}" for key in skipped[:5]]
+        if len(skipped) > 5:
+            lines.append(f"...and {len(skipped) - 5} more left out")
+        summary = f"{len(renames)} renames, {len(removals)} removals."
+        if skipped:
+            summary += (
+                f" {len(skipped)} lines are left out, with their sublines, because "
+                "the same text appears twice under one parent."
+            )
+        self.summaryLabel.setText("\n".join([summary] + lines))
+
+    def done(self, result):
+        flush_settings()
+        super().done(result)
+
+def renumber_subtags(browser):
+    dlg = RenumberDialog(browser)
+    if dlg.exec() != QDialog.DialogCode.Accepted:
+        return
+    renames, removals, skipped = dlg.plan()
+    left_out = (
+        f"\n\n{len(skipped):,} lines with the same text twice under one parent "
+        "were left out."
+    ) if skipped else ""
+    if not renames and not removals:
+        showInfo(f"Nothing to renumber: the outlines enumerate to the same tags.{left_out}")
+        return
+    parent_tag = dlg.parentTag()
+    outline = dlg.newEdit.toPlainText()
+    indent_width = dlg.indentCombo.currentData()
+
+    def op(col):
+        with Span("renumber", renames=len(renames), removals=len(removals)) as span:
+            result = renumber_op(col, renames, removals)
+            span.set(notes=result.notes_changed)
+        return result
+
+    def on_success(result):
+        remember_outline(parent_tag, outline, indent_width)
+        showInfo(
+            f"Renamed {result.renamed:,} and removed {result.removed:,} subtags "
+            f"on {result.notes_changed:,} notes.{left_out}"
+        )
+
+    CollectionOp(
+        parent=browser,
+        op=op,
+    ).success(on_success).run_in_background()
+
+##############################################################################
+#                    OPT-IN PROFILING FOR FIELD DEBUGGING                    #
+##############################################################################
+def profile_capture(name):
+    """
+    A ProfileCapture for name while profiling is switched on in the Edit
+    menu, otherwise a context manager that does nothing.
+    """
+    if not get_settings().get("profileOperations", False):
+        return contextlib.nullcontext()
+    # cProfile, pstats and tracemalloc are only loaded once profiling is on.
+    from .core.profiling import ProfileCapture
+    return ProfileCapture(PROFILE_DIR, name, on_written=notify_profile_written)
+
+def notify_profile_written(paths):
+    # Captures of background work finish off the main thread.
+    mw.taskman.run_on_main(
+        lambda: tooltip(f"Profile saved to {os.path.dirname(paths[0])}", period=5000)
+    )
+
+def toggle_profiling(checked):
+    ensure_initialised()
+    settings = get_settings()
+    settings["profileOperations"] = checked
+    save_settings(settings)
 
 ##############################################################################
 #                    INTEGRATE ADD-ON INTO THE BROWSER MENU                  #
 ##############################################################################
-old_setupMenus = Browser.setupMenus
+def ensure_initialised():
+    """
+    One-time setup deferred from import to the first time the add-on is
+    used: registering the font, opening the operation log and loading the
+    profile's settings.
+    """
+    if "first_use_ms" in STARTUP_TIMINGS:
+        return
+    started = time.perf_counter()
+    set_operation_log(OperationLog(OPERATION_LOG_FILE))
+    load_orbitron_font()
+    get_settings()
+    STARTUP_TIMINGS["first_use_ms"] = (time.perf_counter() - started) * 1000
 
-def new_setupMenus(self):
-    old_setupMenus(self)
-    
+def on_bulk_subtags_triggered(browser):
+    ensure_initialised()
+    add_subtags_to_cards(browser)
+
+def on_renumber_triggered(browser):
+    ensure_initialised()
+    renumber_subtags(browser)
+
+def setup_browser_menu(browser):
     # Add new action for bulk subtags
-    action = QAction("Bulk Subtags", self)
-    action.triggered.connect(lambda: add_subtags_to_cards(self))
+    action = QAction("Bulk Subtags", browser)
+    action.triggered.connect(lambda: on_bulk_subtags_triggered(browser))
     action.setShortcut("Alt+B")  # Shortcut to open the add-on
     action.setToolTip("Open Bulk Subtags dialog (Alt+B)")
     
     # Instead of using the Tools menu, look for the Edit menu
     edit_menu = None
-    if hasattr(self.form, "menuEdit"):
-        edit_menu = self.form.menuEdit
+    if hasattr(browser.form, "menuEdit"):
+        edit_menu = browser.form.menuEdit
     else:
-        edit_menu = self.menuBar().findChild(QMenu, "menuEdit")
+        edit_menu = browser.menuBar().findChild(QMenu, "menuEdit")
+    renumber_action = QAction("Renumber Subtags", browser)
+    renumber_action.triggered.connect(lambda: on_renumber_triggered(browser))
+    renumber_action.setToolTip("Rename existing subtags after their outline was edited")
+    profile_action = QAction("Profile Bulk Subtags", browser)
+    profile_action.setCheckable(True)
+    profile_action.setToolTip(
+        "Record cProfile and memory reports of applying subtags and building the tag tree"
+    )
+    profile_action.triggered.connect(toggle_profiling)
+    # The check mark is read when the menu opens, so settings are not
+    # loaded just because a browser window was.
+    sync_profile_action = lambda: profile_action.setChecked(
+        get_settings().get("profileOperations", False)
+    )
     if edit_menu:
         edit_menu.addAction(action)
+        edit_menu.addAction(renumber_action)
+        edit_menu.addAction(profile_action)
+        edit_menu.aboutToShow.connect(sync_profile_action)
     else:
-        self.menuBar().addAction(action)
+        browser.menuBar().addAction(action)
+        browser.menuBar().addAction(renumber_action)
+        browser.menuBar().addAction(profile_action)
+        sync_profile_action()
+
+def startup_timings():
+    """
+    Milliseconds spent by this add-on in module import ("import_ms") and in
+    the deferred first-use setup ("first_use_ms", once it has run).
+    """
+    return dict(STARTUP_TIMINGS)
 
-Browser.setupMenus = new_setupMenus
-print("Bulk Create Subtags add-on loaded.")
\ No newline at end of file
+# Only hook registration happens at import; no files, fonts or Qt objects.
+gui_hooks.browser_menus_did_init.append(setup_browser_menu)
+gui_hooks.operation_did_execute.append(on_operation_did_execute)
+gui_hooks.profile_will_close.append(unload_settings)
+gui_hooks.profile_will_close.append(invalidate_tag_snapshot)
+STARTUP_TIMINGS["import_ms"] = (time.perf_counter() - _IMPORT_STARTED) * 1000
+print(f"Bulk Create Subtags add-on loaded in {STARTUP_TIMINGS['import_ms']:.1f} ms.")
@@ -0,0 +1,182 @@
+"""
+Randomised equivalence checks for the outline enumerators, run against core
+without Anki:
+
+    python bench/check_outline.py --rounds 2000 --seed 1
+
+enumerate_outline is compared with the original fixed-depth enumerator,
+kept below as the reference. IncrementalOutline is put through random edit
+sequences: after every edit its tags must match enumerate_outline over the
+edited lines, and every preview line outside the range replace_lines
+returned must be unchanged. The outline file readers are run over a few
+fixed files, one per format. The first case that disagrees is printed and
+the script exits non-zero.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+from core.outline_files import iter_outline_file
+
+# Few distinct words, so repeated lines and duplicate paths are common.
+WORDS = ["A", "B", "C", "Renal", "High Yield", "a b"]
+
+def reference_enumerate(lines):
+    """The enumerator as first shipped: 4-column levels, at most 50 deep."""
+    counters = [0] * 50
+    levels = [None] * 50
+    results = []
+    for line in lines:
+        leading_spaces = 0
+        for ch in line:
+            if ch == " ":
+                leading_spaces += 1
+            elif ch == "\t":
+                leading_spaces += 4
+            else:
+                break
+        indent_level = leading_spaces // 4
+        raw_content = line.strip()
+        if not raw_content:
+            continue
+        for i in range(indent_level + 1, len(counters)):
+            counters[i] = 0
+            levels[i] = None
+        counters[indent_level] += 1
+        enumerated_name = f"{counters[indent_level]:02d}_{core.replace_spaces_with_underscores(raw_content)}"
+        levels[indent_level] = enumerated_name
+        results.append("::".join(levels[i] for i in range(indent_level + 1) if levels[i]))
+    return list(dict.fromkeys(results))
+
+def random_line(rng, max_level):
+    """A line indented by spaces, tabs or both, not always by whole levels."""
+    roll = rng.random()
+    if roll < 0.1:
+        return rng.choice(["", "   ", "\t"])
+    level = rng.randint(0, max_level)
+    if roll < 0.6:
+        indent = " " * (4 * level)
+    elif roll < 0.75:
+        indent = "\t" * level
+    elif roll < 0.9:
+        # Tabs and spaces mixed in one indent, in either order.
+        tabs = rng.randint(0, level)
+        indent = "\t" * tabs + " " * rng.randint(1, 6)
+        if rng.random() < 0.5:
+            indent = indent[::-1]
+    else:
+        indent = " " * rng.randint(0, 4 * level + 3)
+    return indent + rng.choice(WORDS) + rng.choice(["", " ", "\t"])
+
+def random_outline(rng, max_lines=40, max_level=6):
+    return [random_line(rng, max_level) for _ in range(rng.randint(0, max_lines))]
+
+def check_enumerate(rng, rounds):
+    for _ in range(rounds):
+        lines = random_outline(rng)
+        expected = reference_enumerate(lines)
+        actual = core.parse_indented_subtags_enumerate_all(lines)
+        if actual != expected:
+            return f"enumerate_outline differs for {lines!r}:\n{actual}\n{expected}"
+    return None
+
+def displays(outline):
+    return [outline.display(i) for i in range(len(outline))]
+
+def check_incremental(rng, rounds, edits=30):
+    for _ in range(rounds):
+        indent_width = rng.choice((None, 2, 4))
+        outline = core.IncrementalOutline(indent_width)
+        lines = [""]
+        for _ in range(edits):
+            start = rng.randint(0, len(lines))
+            removed = rng.randint(0, min(len(lines) - start, 8))
+            new_lines = random_outline(rng, max_lines=5)
+            if len(lines) - removed + len(new_lines) == 0:
+                new_lines = [random_line(rng, 6)]
+            before = displays(outline)
+            edit = (start, removed, new_lines)
+            start, old_stop, new_stop = outline.replace_lines(*edit)
+            lines[edit[0]:edit[0] + removed] = new_lines
+            case = f"width {indent_width}, edit {edit!r} giving {lines!r}"
+            expected = list(core.enumerate_outline(lines, indent_width))
+            if outline.tags() != expected:
+                return f"IncrementalOutline.tags() differs after {case}:\n{outline.tags()}\n{expected}"
+            after = displays(outline)
+            if after[:start] != before[:start] or after[new_stop:] != before[old_stop:]:
+                return f"Lines outside {start, old_stop, new_stop} changed after {case}"
+    return None
+
+# (file name, contents, expected tags, expected errors) for the file readers.
+FILE_CASES = [
+    ("outline.txt", "A\n    B\n\tC\n\nD\n", ["01_A", "01_A::01_B", "01_A::02_C", "02_D"], []),
+    (
+        "outline.md",
+        "# Top\nIntro text\n- a\n    - b\n```\n- ignored\n```\n## Sub ##\n* c\n1. d\n",
+        [
+            "01_Top", "01_Top::01_a", "01_Top::01_a::01_b", "01_Top::02_Sub",
+            "01_Top::02_Sub::01_c", "01_Top::02_Sub::02_d",
+        ],
+        [],
+    ),
+    (
+        "outline.opml",
+        '<?xml version="1.0"?><opml version="2.0"><head><title>T</title></head><body>'
+        '<outline text="A"><outline text="B"/><outline title="C"/></outline>'
+        '<outline text="D"/></body></opml>',
+        ["01_A", "01_A::01_B", "01_A::02_C", "02_D"],
+        [],
+    ),
+    (
+        "outline.csv",
+        "\ufeffLevel,Title\n1,A\n2,B\nx,Bad\n2,C\n",
+        ["01_A", "01_A::01_B", "01_A::02_C"],
+        [(4, "level 'x' is not a number")],
+    ),
+    (
+        "outline.tsv",
+        "A\t\n\tB\n\t\tC\n\tD\n",
+        ["01_A", "01_A::01_B", "01_A::01_B::01_C", "01_A::02_D"],
+        [],
+    ),
+]
+
+def check_outline_files():
+    with tempfile.TemporaryDirectory() as directory:
+        for name, text, expected, expected_errors in FILE_CASES:
+            path = os.path.join(directory, name)
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            errors = []
+            actual = list(core.enumerate_outline_entries(iter_outline_file(path, None, errors)))
+            if actual != expected or errors != expected_errors:
+                return f"{name} reads as {actual} with errors {errors}"
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    failure = (
+        check_enumerate(rng, args.rounds)
+        or check_incremental(rng, args.rounds)
+        or check_outline_files()
+    )
+    if failure:
+        print(failure)
+        sys.exit(1)
+    print(
+        f"{args.rounds:,} random outlines enumerate as before, and "
+        f"{args.rounds:,} random edit sequences keep the live preview in step. "
+        f"All {len(FILE_CASES)} outline files read as expected."
+    )
+
+if __name__ == "__main__":
+    main()
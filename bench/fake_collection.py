@@ -0,0 +1,160 @@
+"""
+In-memory stand-in for the parts of anki.collection.Collection that core
+uses: col.db.all/list against real notes and cards tables (in sqlite), and
+col.tags bulk_add/rename/remove/all, with a single level of undo.
+"""
+import random
+import sqlite3
+from types import SimpleNamespace
+
+from synthetic import generate_notes
+
+class FakeDb:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def all(self, sql, *args):
+        return self._conn.execute(sql, args).fetchall()
+
+    def list(self, sql, *args):
+        return [row[0] for row in self._conn.execute(sql, args)]
+
+    def scalar(self, sql, *args):
+        row = self._conn.execute(sql, args).fetchone()
+        return row[0] if row else None
+
+def split_tag_string(tag_string):
+    return tag_string.split()
+
+def join_tags(tags):
+    # Anki stores tags space separated with a leading and trailing space.
+    return f" {' '.join(tags)} " if tags else ""
+
+class FakeTags:
+    def __init__(self, col):
+        self._col = col
+        self._registry = {}
+
+    def register(self, tags):
+        for tag in tags:
+            self._registry.setdefault(tag.lower(), tag)
+
+    def all(self):
+        return list(self._registry.values())
+
+    def bulk_add(self, note_ids, space_separated_tags):
+        new_tags = space_separated_tags.split()
+        self.register(new_tags)
+        count = 0
+        for nid, tag_string in self._col.db.all(
+            f"select id, tags from notes where id in ({','.join(map(str, note_ids))})"
+        ):
+            current = split_tag_string(tag_string)
+            have = {tag.lower() for tag in current}
+            added = [tag for tag in new_tags if tag.lower() not in have]
+            if added:
+                self._col._write_tags(nid, tag_string, join_tags(current + added))
+                count += 1
+        return SimpleNamespace(count=count)
+
+    def _rewrite(self, change):
+        """Applies change(tags) -> tags to every note; returns notes changed."""
+        count = 0
+        for nid, tag_string in self._col.db.all("select id, tags from notes"):
+            current = split_tag_string(tag_string)
+            updated = change(current)
+            if updated != current:
+                self._col._write_tags(nid, tag_string, join_tags(updated))
+                count += 1
+        return count
+
+    def rename(self, old, new):
+        old_lower = old.lower()
+
+        def change(tags):
+            return [
+                new + tag[len(old):]
+                if tag.lower() == old_lower or tag.lower().startswith(old_lower + "::")
+                else tag
+                for tag in tags
+            ]
+
+        self._registry = {
+            key: tag for key, tag in
+            ((t.lower(), t) for t in change(list(self._registry.values())))
+        }
+        return SimpleNamespace(count=self._rewrite(change))
+
+    def remove(self, space_separated_tags):
+        gone = {tag.lower() for tag in space_separated_tags.split()}
+
+        def removed(tag):
+            lower = tag.lower()
+            return any(lower == g or lower.startswith(g + "::") for g in gone)
+
+        for key in [key for key in self._registry if removed(key)]:
+            del self._registry[key]
+        return SimpleNamespace(
+            count=self._rewrite(lambda tags: [t for t in tags if not removed(t)])
+        )
+
+class FakeCollection:
+    def __init__(self):
+        self._conn = sqlite3.connect(":memory:")
+        self._conn.executescript(
+            "create table notes (id integer primary key, tags text not null);"
+            "create table cards (id integer primary key, nid integer not null);"
+        )
+        self.db = FakeDb(self._conn)
+        self.tags = FakeTags(self)
+        self._undo_log = None
+
+    def _write_tags(self, nid, old, new):
+        if self._undo_log is not None:
+            self._undo_log.append((nid, old))
+        self._conn.execute("update notes set tags = ? where id = ?", (new, nid))
+
+    def add_custom_undo_entry(self, name):
+        self._undo_log = []
+        return 1
+
+    def merge_undo_entries(self, target):
+        return SimpleNamespace(tag=True, note_text=True)
+
+    def undo(self):
+        for nid, old in reversed(self._undo_log or []):
+            self._conn.execute("update notes set tags = ? where id = ?", (old, nid))
+        self._undo_log = None
+        return SimpleNamespace(changes=SimpleNamespace(tag=True, note_text=True))
+
+    def add_notes(self, note_tags, cards_per_note, rng):
+        """
+        Inserts one note per tag list in note_tags, each with a number of
+        cards averaging cards_per_note. Returns the card ids.
+        """
+        notes = []
+        cards = []
+        card_id = 1
+        whole = int(cards_per_note)
+        fraction = cards_per_note - whole
+        for nid, tags in enumerate(note_tags, start=1):
+            notes.append((nid, join_tags(tags)))
+            self.tags.register(tags)
+            for _ in range(max(1, whole + (rng.random() < fraction))):
+                cards.append((card_id, nid))
+                card_id += 1
+        self._conn.executemany("insert into notes values (?, ?)", notes)
+        self._conn.executemany("insert into cards values (?, ?)", cards)
+        return [cid for cid, _ in cards]
+
+def build_collection(tags, notes, cards_per_note=1.0, tags_per_note=(1, 5), seed=0):
+    """
+    Returns (col, card_ids) for a collection knowing tags, with notes
+    tagged by synthetic.generate_notes.
+    """
+    rng = random.Random(seed)
+    col = FakeCollection()
+    col.tags.register(tags)
+    note_tags = generate_notes(tags, notes, tags_per_note, seed)
+    card_ids = col.add_notes(note_tags, cards_per_note, rng)
+    return col, card_ids
@@ -0,0 +1,242 @@
+"""
+Benchmarks for the add-on's hot paths, run against core and an in-memory
+FakeCollection, so Anki does not need to be installed:
+
+    python bench/run.py --tags 1000 10000 100000 --output results.json
+
+Every benchmark is timed per collection size and the results are written as
+JSON (to stdout unless --output is given), one record per benchmark with
+timings in milliseconds, for comparing releases.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ADDON_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import core
+from fake_collection import build_collection
+from synthetic import SHAPES, generate_outline, generate_tags
+
+# Bumped whenever records change shape.
+SCHEMA_VERSION = 2
+
+# Typed one character at a time for the search and completion benchmarks.
+DEFAULT_QUERIES = ["pathoma", "renal_dis", "uworld::step::12"]
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - started) * 1000, result
+
+def repeat(fn, repeats):
+    """Best and median of several runs of fn(), in ms."""
+    times = [timed(fn)[0] for _ in range(repeats)]
+    return {"best_ms": min(times), "median_ms": statistics.median(times), "runs": repeats}
+
+def per_keystroke(times):
+    times = sorted(times)
+    return {
+        "keystrokes": len(times),
+        "median_ms": statistics.median(times),
+        "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))],
+        "max_ms": times[-1],
+        "total_ms": sum(times),
+    }
+
+def bench_parse(args):
+    outline = generate_outline(args.outline_lines, max_depth=6, seed=args.seed)
+    stats = repeat(lambda: core.parse_indented_subtags_enumerate_all(outline), args.repeats)
+    stats["lines"] = len(outline)
+
+    def live_edits():
+        incremental = core.IncrementalOutline(None)
+        incremental.replace_lines(0, 0, outline)
+        # Edit a line near the top, as when renaming a section.
+        for i in range(0, min(len(outline), 200), 10):
+            incremental.replace_lines(i, 1, [outline[i] + " (edited)"])
+
+    incremental = repeat(live_edits, args.repeats)
+    incremental["lines"] = len(outline)
+    return {"parse_outline": stats, "incremental_outline": incremental}
+
+def bench_tree(tags, args):
+    results = {}
+    snapshot = None
+
+    def build():
+        nonlocal snapshot
+        snapshot = core.TagSnapshot(tags)
+        snapshot.trie
+        return snapshot
+
+    results["tree_build"] = repeat(build, args.repeats)
+    results["tree_build"]["nodes"] = len(snapshot.trie)
+    results["search_index_build"] = repeat(
+        lambda: core.TagSearchIndex(snapshot.trie), args.repeats
+    )
+    results["completion_index_build"] = repeat(
+        lambda: core.TagCompletionIndex(snapshot.tags), args.repeats
+    )
+
+    search_times = []
+    complete_times = []
+    for query in args.queries:
+        index = core.TagSearchIndex(snapshot.trie)
+        completion = core.TagCompletionIndex(snapshot.tags)
+
+        def search_layout(text):
+            # The whole background pass: matching and laying out the view.
+            return snapshot.trie.visible_layout(index.search(text))
+
+        for end in range(1, len(query) + 1):
+            search_times.append(timed(search_layout, query[:end])[0])
+            complete_times.append(timed(completion.complete, query[:end])[0])
+        # Deleting back to empty widens the search again.
+        for end in range(len(query) - 1, 0, -1):
+            search_times.append(timed(search_layout, query[:end])[0])
+    results["search_per_keystroke"] = per_keystroke(search_times)
+    results["complete_per_keystroke"] = per_keystroke(complete_times)
+    return snapshot, results
+
+def bench_settings(snapshot, args):
+    trie = snapshot.trie
+    expanded = core.ExpansionState(
+        trie.path(n) for n in range(1, min(len(trie), core.EXPANSION_LIMIT + 1))
+    )
+    data = {"expanded": expanded, "explanationVisible": True}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "profile.json")
+        save = repeat(lambda: core.write_settings_file(path, data), args.repeats)
+        save["bytes"] = os.path.getsize(path)
+
+        def load():
+            loaded = core.load_settings(path)
+            state = core.ExpansionState.from_settings(loaded)
+            state.prune(lambda p: trie.find(p) is not None)
+
+        load_stats = repeat(load, args.repeats)
+    save["expanded"] = len(expanded)
+    return {"settings_save": save, "settings_load": load_stats}
+
+def bench_apply(tags, args):
+    col, card_ids = build_collection(
+        tags, args.notes, args.cards_per_note, tuple(args.tags_per_note), args.seed
+    )
+    selected = card_ids[:max(1, int(len(card_ids) * args.selected))]
+    outline = generate_outline(args.apply_lines, seed=args.seed)
+    results = {}
+    ms, note_ids = timed(core.note_ids_for_cards, col, selected)
+    results["notes_for_cards"] = {"ms": ms, "cards": len(selected), "notes": len(note_ids)}
+    ms, paths = timed(core.parse_indented_subtags_enumerate_all, outline)
+    full_tags = [f"Bench::{path}" for path in paths]
+    unique_tags, _ = core.merge_tags([], full_tags)
+    space_separated_tags = " ".join(unique_tags)
+    lower_tags = {tag.lower() for tag in col.tags.all()}
+    ms, report = timed(core.compute_impact, col, note_ids, unique_tags, lower_tags)
+    results["dry_run"] = {"ms": ms, "notes_affected": report.notes_affected}
+    ms, result = timed(core.apply_tags, col, note_ids, space_separated_tags)
+    results["apply"] = {
+        "ms": ms,
+        "subtags": len(unique_tags),
+        "notes_changed": result.notes_changed,
+        "notes_per_sec": result.notes_changed / (ms / 1000) if ms else None,
+    }
+    # Applying again finds nothing to write.
+    ms, result = timed(core.apply_tags, col, note_ids, space_separated_tags)
+    results["apply_noop"] = {"ms": ms, "notes_changed": result.notes_changed}
+    return results, len(card_ids)
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ADDON_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    records = []
+
+    def add(name, tag_count, stats):
+        records.append({"benchmark": name, "tags": tag_count, **stats})
+
+    for name, stats in bench_parse(args).items():
+        add(name, None, stats)
+    for tag_count in args.tags:
+        print(f"Benchmarking {tag_count:,} tags...", file=sys.stderr)
+        tags = generate_tags(tag_count, args.shape, args.seed)
+        snapshot, tree_results = bench_tree(tags, args)
+        for name, stats in tree_results.items():
+            add(name, tag_count, stats)
+        for name, stats in bench_settings(snapshot, args).items():
+            add(name, tag_count, stats)
+        if not args.skip_apply:
+            apply_results, cards = bench_apply(tags, args)
+            for name, stats in apply_results.items():
+                add(name, tag_count, {"cards_total": cards, **stats})
+    return {
+        "schema": SCHEMA_VERSION,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "tags": args.tags,
+            "shape": args.shape,
+            "notes": args.notes,
+            "cards_per_note": args.cards_per_note,
+            "tags_per_note": args.tags_per_note,
+            "selected": args.selected,
+            "outline_lines": args.outline_lines,
+            "apply_lines": args.apply_lines,
+            "queries": args.queries,
+            "repeats": args.repeats,
+            "seed": args.seed,
+        },
+        "results": records,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tags", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="collection tag counts to benchmark, e.g. 1000 1000000")
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="anking",
+                        help="depth and fan-out of the generated tag hierarchy")
+    parser.add_argument("--notes", type=int, default=20000, help="notes in the collection")
+    parser.add_argument("--cards-per-note", type=float, default=1.5)
+    parser.add_argument("--tags-per-note", type=int, nargs=2, default=[1, 5],
+                        metavar=("MIN", "MAX"))
+    parser.add_argument("--selected", type=float, default=1.0,
+                        help="fraction of cards selected for the apply")
+    parser.add_argument("--outline-lines", type=int, default=5000,
+                        help="lines in the outline parsing benchmark")
+    parser.add_argument("--apply-lines", type=int, default=50,
+                        help="outline lines applied to the selected notes")
+    parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-apply", action="store_true",
+                        help="only benchmark parsing, the tree, search and settings")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    report = run(args)
+    text = json.dumps(report, indent=1)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Seeded, deterministic generators for load testing: tag hierarchies shaped
+like the AnKing decks (`#AK_Step1_v11::#Pathoma::20_Index::...`), indented
+outlines and notes carrying those tags. Numbered segments are produced by
+core.enumerate_outline from generated outlines, so they follow exactly the
+NN_ convention the add-on writes. The same arguments always give the same
+output.
+
+    python bench/synthetic.py tags --count 100000 --shape anking > tags.txt
+    python bench/synthetic.py outline --lines 5000 --max-depth 6 > outline.txt
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+ANKING_ROOTS = ["#AK_Step1_v11", "#AK_Step2_v11", "#AK_Step3_v11"]
+RESOURCES = [
+    "#Pathoma", "#B&B", "#FirstAid", "#Sketchy", "#Physeo",
+    "#BootCamp", "#Pixorize", "#OME", "#Costanzo",
+]
+QID_RESOURCE = "#UWorld"
+
+# Words titles are made of; spaces become underscores when enumerated.
+TOPIC_WORDS = [
+    "Cell", "Injury", "Inflammation", "Neoplasia", "Hemodynamics", "Immunology",
+    "Renal", "Cardiac", "Pulmonary", "Hepatic", "Endocrine", "Neurology",
+    "Pharmacology", "Microbiology", "Genetics", "Biochemistry", "Anatomy",
+    "Physiology", "Pathology", "Embryology", "Disorders", "Syndromes",
+    "Mechanisms", "Signs", "Treatment", "Diagnosis", "Receptors", "Enzymes",
+    "Vitamins", "Toxicity", "Antibiotics", "Viruses", "Bacteria", "Fungi",
+]
+SPECIAL_TITLES = ["Index", "Review", "High Yield", "Misc"]
+
+# Outline shapes: deepest level below a resource, siblings per parent on
+# average, chance that a line has children, and the share of tags that are
+# flat question ids under #UWorld.
+SHAPES = {
+    "flat": {"max_depth": 2, "fanout": 12, "descend": 0.5, "qid_share": 0.0},
+    "balanced": {"max_depth": 4, "fanout": 6, "descend": 0.6, "qid_share": 0.0},
+    "deep": {"max_depth": 10, "fanout": 3, "descend": 0.8, "qid_share": 0.0},
+    "anking": {"max_depth": 5, "fanout": 8, "descend": 0.55, "qid_share": 0.3},
+}
+
+def make_title(rng):
+    if rng.random() < 0.05:
+        return rng.choice(SPECIAL_TITLES)
+    return " ".join(rng.sample(TOPIC_WORDS, rng.choice((1, 2, 2, 3))))
+
+def iter_outline_lines(rng, max_depth, fanout, descend, indent="    "):
+    """
+    Endless indented outline: each parent gets around fanout children and a
+    line has children with probability descend, down to max_depth levels.
+    """
+    def section(level):
+        for _ in range(rng.randint(max(1, fanout // 2), fanout * 3 // 2)):
+            yield indent * level + make_title(rng)
+            if level + 1 < max_depth and rng.random() < descend:
+                yield from section(level + 1)
+
+    while True:
+        yield make_title(rng)
+        if max_depth > 1:
+            yield from section(1)
+
+def generate_outline(lines, max_depth=4, fanout=6, descend=0.6, indent="    ", seed=0):
+    """Returns lines indented outline lines."""
+    rng = random.Random(seed)
+    outline = iter_outline_lines(rng, max_depth, fanout, descend, indent)
+    return [next(outline) for _ in range(lines)]
+
+def generate_tags(count, shape="anking", seed=0):
+    """
+    Returns count distinct tags, sorted. Each resource under each root gets
+    its own outline, enumerated into ROOT::RESOURCE::NN_Title::... paths
+    until count is reached; with the anking shape part of the tags are
+    ROOT::#UWorld::Step::<question id>.
+    """
+    params = SHAPES[shape]
+    rng = random.Random(seed)
+    qids = int(count * params["qid_share"])
+    tags = set()
+    # Question ids are spread over the roots like the Step decks.
+    while len(tags) < qids:
+        tags.add(f"{rng.choice(ANKING_ROOTS)}::{QID_RESOURCE}::Step::{rng.randrange(1, 10 ** 6)}")
+    prefixes = [f"{root}::{resource}" for root in ANKING_ROOTS for resource in RESOURCES]
+    per_prefix = -(-(count - len(tags)) // len(prefixes))
+    for prefix in prefixes:
+        lines = iter_outline_lines(rng, params["max_depth"], params["fanout"], params["descend"])
+        wanted = min(per_prefix, count - len(tags))
+        paths = core.enumerate_outline(lines)
+        for _ in range(wanted):
+            tags.add(f"{prefix}::{next(paths)}")
+        if len(tags) >= count:
+            break
+    return sorted(tags)
+
+def generate_notes(tags, count, tags_per_note=(1, 5), seed=0):
+    """
+    Returns count tag lists. Like real notes, each one's tags mostly come
+    from one neighbourhood of the (sorted) hierarchy, with the occasional
+    unrelated tag.
+    """
+    rng = random.Random(seed)
+    low, high = tags_per_note
+    notes = []
+    for _ in range(count):
+        home = rng.randrange(len(tags))
+        picked = {}
+        for _ in range(rng.randint(low, high)):
+            if rng.random() < 0.2:
+                tag = tags[rng.randrange(len(tags))]
+            else:
+                tag = tags[min(len(tags) - 1, max(0, home + rng.randint(-20, 20)))]
+            picked[tag] = None
+        notes.append(list(picked))
+    return notes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print synthetic tags or an outline.")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    tags = sub.add_parser("tags")
+    tags.add_argument("--count", type=int, default=10000)
+    tags.add_argument("--shape", choices=sorted(SHAPES), default="anking")
+    outline = sub.add_parser("outline")
+    outline.add_argument("--lines", type=int, default=1000)
+    outline.add_argument("--max-depth", type=int, default=4)
+    outline.add_argument("--fanout", type=int, default=6)
+    outline.add_argument("--descend", type=float, default=0.6)
+    outline.add_argument("--tabs", action="store_true", help="indent with tabs")
+    for p in (tags, outline):
+        p.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.kind == "tags":
+        lines = generate_tags(args.count, args.shape, args.seed)
+    else:
+        lines = generate_outline(
+            args.lines, args.max_depth, args.fanout, args.descend,
+            "\t" if args.tabs else "    ", args.seed,
+        )
+    sys.stdout.write("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    main()
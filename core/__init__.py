@@ -0,0 +1,78 @@
+"""
+Pure logic of the add-on: outline parsing and enumeration, the tag trie and
+its search and completion indexes, bulk tag reads and writes, renumbering,
+the settings file format and operation timing. The outline file readers
+(core.outline_files) and profiling (core.profiling) pull in heavier standard
+modules and are imported from their own modules when needed. Nothing here
+imports aqt or Qt, so the package can be imported, profiled and benchmarked
+outside Anki by putting the add-on folder on sys.path and running
+`import core`.
+
+Functions that touch the collection take it as `col` and use only:
+
+- col.db.all and col.db.list, for reading note ids and tag strings;
+- col.tags.bulk_add, col.tags.rename and col.tags.remove, whose results
+  carry a `count` of changed notes;
+- col.add_custom_undo_entry, col.merge_undo_entries and col.undo, which
+  group an apply or renumber into one undo step and roll back a cancelled
+  apply. undo() returns an object with `changes`.
+
+A stand-in collection, like bench/fake_collection.py, needs these and
+nothing else.
+"""
+from .apply import (
+    APPLY_CHUNK_SIZE,
+    TAG_FETCH_CHUNK_SIZE,
+    ApplyResult,
+    ImpactReport,
+    apply_tags,
+    compute_impact,
+    ids2str,
+    iter_note_tag_strings,
+    merge_tags,
+    note_ids_for_cards,
+    notes_missing_tags,
+)
+from .completion import (
+    COMPLETION_LIMIT,
+    MIN_SUBSTRING_QUERY,
+    SUBSTRING_SCAN_LIMIT,
+    TagCompletionIndex,
+)
+from .oplog import (
+    LOG_BACKUPS,
+    LOG_MAX_BYTES,
+    OperationLog,
+    Span,
+    set_operation_log,
+)
+from .outline import (
+    DEFAULT_INDENT_WIDTH,
+    IncrementalOutline,
+    IndentParser,
+    enumerate_outline,
+    enumerate_outline_entries,
+    parse_indentation_level,
+    parse_indented_subtags_enumerate_all,
+    replace_spaces_with_underscores,
+)
+from .restructure import (
+    RenumberResult,
+    outline_key,
+    plan_renumber,
+    renumber_op,
+    reparent_problem,
+    reparented_tag,
+)
+from .settings import (
+    EXPANSION_LIMIT,
+    ExpansionState,
+    decode_paths,
+    encode_paths,
+    load_settings,
+    settings_json_default,
+    write_file_atomically,
+    write_settings_file,
+)
+from .snapshot import TagSnapshot
+from .tagtree import SearchSuperseded, TagSearchIndex, TagTrie
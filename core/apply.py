@@ -0,0 +1,145 @@
+"""Reading and adding note tags in bulk, including the dry run."""
+import time
+from dataclasses import dataclass
+
+def ids2str(ids):
+    """SQL id list, as anki.utils.ids2str builds it."""
+    return "(" + ",".join(str(int(i)) for i in ids) + ")"
+
+def merge_tags(current_tags, new_tags):
+    """
+    Order-preserving merge of new_tags into current_tags. Tags are matched
+    case-insensitively, like Anki does. Returns (merged, changed).
+    """
+    seen = {tag.lower() for tag in current_tags}
+    merged = list(current_tags)
+    for tag in new_tags:
+        key = tag.lower()
+        if key not in seen:
+            seen.add(key)
+            merged.append(tag)
+    return merged, len(merged) != len(current_tags)
+
+# Notes fetched per query when reading stored tag strings in bulk.
+TAG_FETCH_CHUNK_SIZE = 10000
+
+def iter_note_tag_strings(col, note_ids):
+    """Yields (note_id, tags) rows straight from the notes table, in chunks."""
+    for offset in range(0, len(note_ids), TAG_FETCH_CHUNK_SIZE):
+        chunk = note_ids[offset:offset + TAG_FETCH_CHUNK_SIZE]
+        yield from col.db.all(f"select id, tags from notes where id in {ids2str(chunk)}")
+
+def notes_missing_tags(col, note_ids, new_tags):
+    """
+    Returns the subset of note_ids that lack at least one of new_tags, using
+    one query over the stored tag strings instead of loading each note.
+    """
+    wanted = {tag.lower() for tag in new_tags}
+    return [
+        nid for nid, tag_string in iter_note_tag_strings(col, note_ids)
+        if wanted.difference(tag_string.lower().split())
+    ]
+
+@dataclass
+class ImpactReport:
+    notes_selected: int
+    notes_affected: int
+    notes_unchanged: int
+    tags_total: int
+    tags_new: int
+    tag_additions: int
+    bytes_written: int
+
+def compute_impact(col, note_ids, new_tags, collection_tags_lower):
+    """
+    Dry run of adding new_tags to note_ids: what would change, without
+    writing anything. bytes_written estimates the size of the tag fields
+    that would be rewritten.
+    """
+    wanted = {tag.lower() for tag in new_tags}
+    # Work from the tags a note already has, which are few, rather than
+    # from the ones it lacks.
+    wanted_bytes = sum(len(tag) + 1 for tag in wanted)
+    affected = 0
+    additions = 0
+    bytes_written = 0
+    for _nid, tag_string in iter_note_tag_strings(col, note_ids):
+        present = wanted.intersection(tag_string.lower().split())
+        if len(present) < len(wanted):
+            affected += 1
+            additions += len(wanted) - len(present)
+            bytes_written += (
+                len(tag_string.strip())
+                + wanted_bytes
+                - sum(len(tag) + 1 for tag in present)
+            )
+    return ImpactReport(
+        notes_selected=len(note_ids),
+        notes_affected=affected,
+        notes_unchanged=len(note_ids) - affected,
+        tags_total=len(wanted),
+        tags_new=len(wanted - collection_tags_lower),
+        tag_additions=additions,
+        bytes_written=bytes_written,
+    )
+
+def note_ids_for_cards(col, card_ids):
+    """Collapse card ids to their distinct note ids in a single query."""
+    if not card_ids:
+        return []
+    return col.db.list(
+        f"select distinct nid from cards where id in {ids2str(card_ids)}"
+    )
+
+# Notes written per bulk_add call; cancellation is checked between chunks.
+APPLY_CHUNK_SIZE = 2000
+
+@dataclass
+class ApplyResult:
+    changes: object
+    notes_total: int
+    notes_processed: int
+    notes_changed: int
+    cancelled: bool = False
+    rolled_back: bool = False
+
+def apply_tags(col, note_ids, space_separated_tags, rollback_on_cancel=False,
+               want_cancel=None, on_progress=None):
+    """
+    Adds the tags to note_ids chunk by chunk. want_cancel() is polled
+    between chunks and on_progress(done, total, started) called after each.
+    All chunks are merged into a single undo entry, which is also what a
+    rollback undoes.
+    """
+    new_tags = space_separated_tags.split()
+    undo_pos = col.add_custom_undo_entry("Bulk Subtags")
+    total = len(note_ids)
+    processed = 0
+    changed = 0
+    cancelled = False
+    started = time.monotonic()
+    for offset in range(0, total, APPLY_CHUNK_SIZE):
+        if want_cancel is not None and want_cancel():
+            cancelled = True
+            break
+        chunk = note_ids[offset:offset + APPLY_CHUNK_SIZE]
+        # Notes that already carry every tag are never written.
+        to_write = notes_missing_tags(col, chunk, new_tags)
+        if to_write:
+            changed += col.tags.bulk_add(to_write, space_separated_tags).count
+        processed += len(chunk)
+        if on_progress is not None:
+            on_progress(processed, total, started)
+    changes = col.merge_undo_entries(undo_pos)
+    rolled_back = False
+    if cancelled and rollback_on_cancel and processed:
+        changes = col.undo().changes
+        rolled_back = True
+    return ApplyResult(
+        changes=changes,
+        notes_total=total,
+        notes_processed=processed,
+        notes_changed=changed,
+        cancelled=cancelled,
+        rolled_back=rolled_back,
+    )
@@ -0,0 +1,122 @@
+"""Ranked completion over tag strings."""
+import heapq
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Number of suggestions shown by the parent tag completer.
+COMPLETION_LIMIT = 50
+# Shorter queries only get the prefix ranks; nearly every tag contains a
+# single letter somewhere.
+MIN_SUBSTRING_QUERY = 2
+# Substring hits examined before ranking, so common fragments cost a
+# bounded scan rather than a pass over every tag.
+SUBSTRING_SCAN_LIMIT = 2000
+# Leading "#" and NN_ enumeration prefixes, which the last-segment rank
+# looks past: most segments in an enumerated or AnKing-style collection
+# start with one.
+SEGMENT_DECORATION = re.compile(r"#*(?:\d+_)?")
+
+class TagCompletionIndex:
+    """
+    Ranked, case-insensitive completion over tag strings. Matches are
+    ranked, best first:
+      0. the last "::" segment, past any leading "#" and NN_ number,
+         starts with the query
+      1. the whole tag starts with the query
+      2. the last segment contains the query
+      3. the tag contains the query anywhere
+    and within a rank shorter tags come first. Prefix ranks binary search
+    sorted lowercase keys; substring ranks scan one concatenated string,
+    only for queries of at least MIN_SUBSTRING_QUERY characters, and rank
+    the first SUBSTRING_SCAN_LIMIT hits in tag order.
+    """
+
+    def __init__(self, tags):
+        self.tags = tags
+        lower = [tag.lower() for tag in tags]
+        last = [tag.rpartition("::")[2] for tag in lower]
+        decoration = SEGMENT_DECORATION.match
+        last_keys = [segment[decoration(segment).end():] for segment in last]
+        self._by_tag = sorted(range(len(tags)), key=lower.__getitem__)
+        self._tag_keys = [lower[i] for i in self._by_tag]
+        self._by_last = sorted(range(len(tags)), key=last_keys.__getitem__)
+        self._last_keys = [last_keys[i] for i in self._by_last]
+        # Position of each tag in rank order within a match rank (shorter
+        # first, then alphabetical), so ranking compares plain ints.
+        rank = array("i", bytes(4 * len(tags)))
+        by_rank = sorted(range(len(tags)), key=lambda i: (len(lower[i]), lower[i]))
+        for position, i in enumerate(by_rank):
+            rank[i] = position
+        self._rank = rank
+        starts = array("q", bytes(8 * (len(tags) + 1)))
+        last_start = array("i", bytes(4 * len(tags)))
+        offset = 0
+        for i, tag in enumerate(lower):
+            starts[i] = offset
+            last_start[i] = len(tag) - len(last[i])
+            offset += len(tag) + 1
+        starts[len(tags)] = offset
+        self.blob = "\n".join(lower) + "\n" if tags else ""
+        self.starts = starts
+        self.last_start = last_start
+
+    @staticmethod
+    def _prefix_range(keys, prefix):
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + "\U0010ffff", lo)
+        return lo, hi
+
+    def _contains(self, query, max_hits=SUBSTRING_SCAN_LIMIT):
+        """
+        Up to max_hits tags containing query, split into (in last segment,
+        elsewhere).
+        """
+        blob = self.blob
+        starts = self.starts
+        in_last = []
+        elsewhere = []
+        last = len(starts) - 1
+        pos = blob.find(query)
+        while pos != -1:
+            i = bisect_right(starts, pos, 0, last) - 1
+            tag_end = starts[i + 1] - 1
+            if blob.find(query, max(pos, starts[i] + self.last_start[i]), tag_end) != -1:
+                in_last.append(i)
+            else:
+                elsewhere.append(i)
+            if len(in_last) + len(elsewhere) >= max_hits:
+                break
+            pos = blob.find(query, starts[i + 1])
+        return in_last, elsewhere
+
+    def complete(self, text, limit=COMPLETION_LIMIT):
+        """
+        Up to limit tags matching text, best first.
+
+        >>> TagCompletionIndex(["#AK::#Pathoma::01_Cell", "#AK::#Costanzo"]).complete("c")
+        ['#AK::#Costanzo', '#AK::#Pathoma::01_Cell']
+        """
+        query = text.strip().lower()
+        if not query:
+            return []
+        results = []
+        seen = set()
+
+        def take(candidates):
+            fresh = [i for i in candidates if i not in seen]
+            best = heapq.nsmallest(limit - len(results), fresh, key=self._rank.__getitem__)
+            seen.update(best)
+            results.extend(best)
+            return len(results) >= limit
+
+        lo, hi = self._prefix_range(self._last_keys, query)
+        if take(self._by_last[lo:hi]):
+            return [self.tags[i] for i in results]
+        lo, hi = self._prefix_range(self._tag_keys, query)
+        if take(self._by_tag[lo:hi]) or len(query) < MIN_SUBSTRING_QUERY:
+            return [self.tags[i] for i in results]
+        in_last, elsewhere = self._contains(query)
+        if not take(in_last):
+            take(elsewhere)
+        return [self.tags[i] for i in results]
@@ -0,0 +1,114 @@
+"""Timing spans for user operations, written to a size-rotated JSON lines log."""
+import itertools
+import json
+import os
+import threading
+import time
+
+from .tagtree import SearchSuperseded
+
+# Size at which the log is rotated, and how many rotated logs are kept.
+LOG_MAX_BYTES = 1_000_000
+LOG_BACKUPS = 3
+
+class OperationLog:
+    """
+    Appends one JSON object per line to path. A write that would take the
+    file past max_bytes first renames it to path.1, shifting older logs up
+    to path.<backups>. Safe to share between threads; write errors are
+    printed, never raised.
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        if self.backups < 1:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                if (os.path.exists(self.path)
+                        and os.path.getsize(self.path) + len(line) > self.max_bytes):
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                print("Error writing operation log:", e)
+
+_log = None
+_span_ids = itertools.count(1)
+_open_spans = threading.local()
+
+def set_operation_log(log):
+    """Spans are written to log from now on; None stops logging."""
+    global _log
+    _log = log
+
+class Span:
+    """
+    Context manager timing one phase of an operation. Counts passed in or
+    given to set() are logged with the duration, and the count named by
+    rate also as a per second figure. A span opened inside another on the
+    same thread records it as parent; work handed to another thread can be
+    linked by passing parent explicitly.
+    """
+
+    def __init__(self, name, rate=None, parent=None, **counts):
+        self.name = name
+        self.rate = rate
+        self.parent = parent
+        self.counts = counts
+        self.id = next(_span_ids)
+        self.ms = None
+        self.status = "ok"
+
+    def set(self, **counts):
+        self.counts.update(counts)
+        return self
+
+    def __enter__(self):
+        stack = _open_spans.__dict__.setdefault("stack", [])
+        if self.parent is None and stack:
+            self.parent = stack[-1]
+        stack.append(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.ms = (time.perf_counter() - self._started) * 1000
+        _open_spans.stack.remove(self)
+        if exc_type is not None:
+            self.status = "superseded" if issubclass(exc_type, SearchSuperseded) else "error"
+        if _log is not None:
+            _log.write(self.record(exc_type))
+        return False
+
+    def record(self, exc_type=None):
+        record = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "op": self.name,
+            "id": self.id,
+            "parent": self.parent.id if self.parent is not None else None,
+            "ms": round(self.ms, 3),
+            "status": self.status,
+        }
+        if self.status == "error":
+            record["error"] = exc_type.__name__
+        record.update(self.counts)
+        count = self.counts.get(self.rate)
+        if count is not None and self.ms > 0:
+            record[f"{self.rate}_per_sec"] = round(count / (self.ms / 1000), 1)
+        return record
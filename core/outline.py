@@ -0,0 +1,265 @@
+"""Indented outline parsing and enumeration into tag paths."""
+
+def replace_spaces_with_underscores(s: str) -> str:
+    return s.replace(" ", "_")
+
+# Spaces per indentation level assumed when none is chosen or detected.
+DEFAULT_INDENT_WIDTH = 4
+
+def parse_indentation_level(line: str, indent_width: int = DEFAULT_INDENT_WIDTH):
+    """
+    Splits line into (level, content) with a single scan for the indent
+    boundary. Spaces count one column and a tab a full level; partial levels
+    are floored.
+    """
+    content = line.lstrip(" \t")
+    indent = line[:len(line) - len(content)]
+    tabs = indent.count("\t")
+    columns = (len(indent) - tabs) + tabs * indent_width
+    return columns // indent_width, content.strip()
+
+class IndentParser:
+    """
+    Stateful line splitter for an outline. indent_width=None auto-detects
+    the width from the first line indented with spaces only. Problems such
+    as indents that are not a multiple of the width, or that skip levels,
+    are collected in `errors` as (line_number, message) and parsing
+    carries on with the floored level.
+    """
+
+    def __init__(self, indent_width=None):
+        self.indent_width = indent_width
+        self.errors = []
+        self.line_number = 0
+        self._prev_level = -1
+
+    def parse(self, line):
+        """Returns (level, content); content is empty for blank lines."""
+        self.line_number += 1
+        content = line.lstrip(" \t")
+        if not content.strip():
+            return 0, ""
+        indent = line[:len(line) - len(content)]
+        tabs = indent.count("\t")
+        spaces = len(indent) - tabs
+        width = self.indent_width
+        if width is None:
+            if spaces and not tabs:
+                width = self.indent_width = spaces
+            else:
+                width = DEFAULT_INDENT_WIDTH
+        columns = spaces + tabs * width
+        level = columns // width
+        if columns % width:
+            self.errors.append((
+                self.line_number,
+                f"indent of {columns} columns is not a multiple of {width}",
+            ))
+        if level > self._prev_level + 1:
+            self.errors.append((
+                self.line_number,
+                f"jumps from level {max(self._prev_level, 0)} to level {level}",
+            ))
+        self._prev_level = level
+        return level, content.strip()
+
+def enumerate_outline_entries(entries):
+    """
+    Yields the unique enumerated tag path for each (level, content) pair, as
+    the pairs are consumed. Only the counters and paths of the current
+    branch are kept, so depth is unbounded and each entry costs the same.
+    Entries with empty content are skipped.
+    """
+    # counters[level] numbers the siblings at that level; paths[level] is
+    # the current path at that level, or the nearest ancestor's path for a
+    # level that was skipped over.
+    counters = []
+    paths = []
+    seen = set()
+    for level, raw_content in entries:
+        if not raw_content:
+            continue
+        if level < len(counters):
+            del counters[level + 1:]
+            del paths[level + 1:]
+        else:
+            while len(counters) < level:
+                paths.append(paths[-1] if paths else "")
+                counters.append(0)
+            counters.append(0)
+            paths.append("")
+        counters[level] += 1
+        content = replace_spaces_with_underscores(raw_content)
+        enumerated_name = f"{counters[level]:02d}_{content}"
+        parent_path = paths[level - 1] if level else ""
+        path = f"{parent_path}::{enumerated_name}" if parent_path else enumerated_name
+        paths[level] = path
+        if path not in seen:
+            seen.add(path)
+            yield path
+
+def enumerate_outline(lines, indent_width=DEFAULT_INDENT_WIDTH, errors=None):
+    """
+    Streams enumerated tag paths for indented lines. When the generator is
+    exhausted, IndentParser's errors are appended to errors if given.
+
+    >>> list(enumerate_outline(["A", "    B", "    B", "C"]))
+    ['01_A', '01_A::01_B', '01_A::02_B', '02_C']
+    >>> list(enumerate_outline(["A", "        Skipped", "    B"]))
+    ['01_A', '01_A::01_Skipped', '01_A::01_B']
+    """
+    parser = IndentParser(indent_width)
+    yield from enumerate_outline_entries(map(parser.parse, lines))
+    if errors is not None:
+        errors.extend(parser.errors)
+
+def parse_indented_subtags_enumerate_all(lines, indent_width=DEFAULT_INDENT_WIDTH, errors=None):
+    return list(enumerate_outline(lines, indent_width, errors))
+
+class IncrementalOutline:
+    """
+    Enumerated outline kept in step with an edited line buffer. frames[i]
+    is the enumerator state after line i: a linked tuple
+    (level, number, name, path, parent_frame) shared by the lines below it.
+    Replacing lines recomputes forward from the edit only until the state
+    matches the one recorded before the edit, so an edit costs the affected
+    siblings and their subtrees rather than the whole outline.
+    indent_width=None detects the width like IndentParser: from the first
+    line indented with spaces only, with lines above it split using
+    DEFAULT_INDENT_WIDTH.
+
+    >>> outline = IncrementalOutline(None)
+    >>> outline.replace_lines(0, 1, ["A", "\\t  B", "  C"])
+    (0, 1, 3)
+    >>> outline.tags() == list(enumerate_outline(outline.lines, None))
+    True
+    """
+
+    def __init__(self, indent_width=DEFAULT_INDENT_WIDTH):
+        self.indent_width = indent_width
+        self.width = indent_width or DEFAULT_INDENT_WIDTH
+        self.lines = [""]
+        self.entries = [(0, "")]
+        self.frames = [None]
+        self.tag_count = 0
+        self._width_line = None
+
+    def __len__(self):
+        return len(self.lines)
+
+    def _detect_width(self, start):
+        """Returns the indent width, rescanning from start if the line it came from may have changed."""
+        if self.indent_width:
+            return self.indent_width
+        if self._width_line is not None and self._width_line < start:
+            return self.width
+        # No line before start is indented with spaces only.
+        self._width_line = None
+        for i in range(start, len(self.lines)):
+            line = self.lines[i]
+            content = line.lstrip(" \t")
+            indent = line[:len(line) - len(content)]
+            if indent and "\t" not in indent and content.strip():
+                self._width_line = i
+                return len(indent)
+        return DEFAULT_INDENT_WIDTH
+
+    def _line_width(self, i, width):
+        if self._width_line is not None and i < self._width_line:
+            return DEFAULT_INDENT_WIDTH
+        return width
+
+    @staticmethod
+    def _step(frame, level, content):
+        number = 1
+        parent = frame
+        while parent is not None and parent[0] >= level:
+            if parent[0] == level:
+                number = parent[1] + 1
+            parent = parent[4]
+        name = f"{number:02d}_{replace_spaces_with_underscores(content)}"
+        path = f"{parent[3]}::{name}" if parent is not None else name
+        return (level, number, name, path, parent)
+
+    def _recompute(self, start, must_reach):
+        """Recomputes frames from start; returns the index where they resynchronised."""
+        entries = self.entries
+        frames = self.frames
+        frame = frames[start - 1] if start else None
+        for i in range(start, len(entries)):
+            level, content = entries[i]
+            if content:
+                frame = self._step(frame, level, content)
+            if i >= must_reach and frames[i] == frame:
+                return i
+            frames[i] = frame
+        return len(entries)
+
+    def set_indent_width(self, indent_width):
+        self.indent_width = indent_width
+        self._width_line = None
+        return self.replace_lines(0, len(self.lines), self.lines)
+
+    def replace_lines(self, start, removed, new_lines):
+        """
+        Replaces lines [start, start + removed) with new_lines. Returns
+        (start, old_stop, new_stop): display lines [start, old_stop) of the
+        previous state are now lines [start, new_stop).
+
+        >>> outline = IncrementalOutline()
+        >>> outline.replace_lines(0, 1, ["A", "    B", "C"])
+        (0, 1, 3)
+        >>> outline.replace_lines(1, 0, ["    X"])
+        (1, 2, 3)
+        >>> outline.tags()
+        ['01_A', '01_A::01_X', '01_A::02_B', '02_C']
+        >>> outline.replace_lines(0, 1, ["Z"])
+        (0, 3, 3)
+        """
+        new_lines = list(new_lines)
+        old_len = len(self.lines)
+        added = len(new_lines)
+        # Where the width line was, in line numbers after the edit.
+        old_width_line = self._width_line
+        if old_width_line is None or start <= old_width_line < start + removed:
+            old_width_line = start
+        elif old_width_line >= start + removed:
+            old_width_line += added - removed
+        self.lines[start:start + removed] = new_lines
+        width = self._detect_width(start)
+        if width != self.width:
+            # Every level depends on the width, so start over.
+            self.width = width
+            start, removed, new_lines = 0, old_len, self.lines
+        elif (
+            not self.indent_width
+            and width != DEFAULT_INDENT_WIDTH
+            and old_width_line != self._width_line
+        ):
+            # Lines between the old and new width line switch widths, so
+            # they are parsed again along with the edit.
+            lo = min(start, old_width_line, self._width_line)
+            hi = max(start + added, old_width_line, self._width_line)
+            removed += (start - lo) + (hi - start - added)
+            start, new_lines = lo, self.lines[lo:hi]
+        new_entries = [
+            parse_indentation_level(line, self._line_width(i, width))
+            for i, line in enumerate(new_lines, start)
+        ]
+        self.tag_count -= sum(1 for _, content in self.entries[start:start + removed] if content)
+        self.tag_count += sum(1 for _, content in new_entries if content)
+        self.entries[start:start + removed] = new_entries
+        self.frames[start:start + removed] = [None] * len(new_entries)
+        new_stop = self._recompute(start, start + len(new_entries))
+        return start, new_stop - len(new_entries) + removed, new_stop
+
+    def display(self, i):
+        """Preview text for line i: the enumerated name, indented by level."""
+        level, content = self.entries[i]
+        if not content:
+            return ""
+        return "    " * level + self.frames[i][2]
+
+    def tags(self):
+        paths = (self.frames[i][3] for i, (_, content) in enumerate(self.entries) if content)
+        return list(dict.fromkeys(paths))
@@ -0,0 +1,109 @@
+"""Streaming readers for outline files (text, Markdown, OPML, CSV/TSV)."""
+import csv
+import itertools
+import os
+import re
+from xml.etree import ElementTree
+
+from .outline import DEFAULT_INDENT_WIDTH, IndentParser
+
+# Readers turn a file into (level, content) pairs for enumerate_outline_entries.
+# They stream line by line (or element by element for OPML), so the whole
+# document is never held in memory.
+MARKDOWN_HEADING = re.compile(r"(#{1,6})\s+(.*?)\s*#*\s*$")
+MARKDOWN_BULLET = re.compile(r"(?:[-*+]|\d+[.)])\s+(.*)")
+
+def iter_text_outline(f, indent_width=DEFAULT_INDENT_WIDTH, errors=None):
+    parser = IndentParser(indent_width)
+    for line in f:
+        yield parser.parse(line)
+    if errors is not None:
+        errors.extend(parser.errors)
+
+def iter_markdown_outline(f, indent_width=DEFAULT_INDENT_WIDTH, errors=None):
+    """
+    Headings give the top levels (# is level 0); list items nest below the
+    most recent heading by their indentation. Other text is ignored.
+    """
+    parser = IndentParser(indent_width)
+    base_level = 0
+    in_fence = False
+    for line in f:
+        level, content = parser.parse(line)
+        if content.startswith(("```", "~~~")):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        heading = MARKDOWN_HEADING.match(content)
+        if heading:
+            level = len(heading.group(1)) - 1
+            base_level = level + 1
+            yield level, heading.group(2)
+            continue
+        bullet = MARKDOWN_BULLET.match(content)
+        if bullet:
+            yield base_level + level, bullet.group(1).strip()
+    if errors is not None:
+        errors.extend(parser.errors)
+
+def iter_opml_outline(path):
+    """Nesting of <outline> elements gives the level, their text attribute the content."""
+    depth = -1
+    for event, elem in ElementTree.iterparse(path, events=("start", "end")):
+        if elem.tag != "outline":
+            continue
+        if event == "start":
+            depth += 1
+            yield depth, (elem.get("text") or elem.get("title") or "").strip()
+        else:
+            depth -= 1
+            elem.clear()
+
+def iter_csv_outline(f, delimiter=",", errors=None):
+    """
+    Table of contents exports in one of two layouts: with a header naming
+    "level" and "title" columns (levels counted from 1), or one column per
+    level where each row's first non-empty cell gives its level and text.
+    """
+    rows = csv.reader(f, delimiter=delimiter)
+    first = next(rows, None)
+    if first is None:
+        return
+    header = [cell.strip().lower() for cell in first]
+    title_names = [name for name in ("title", "name", "topic") if name in header]
+    if "level" in header and title_names:
+        level_col = header.index("level")
+        title_col = header.index(title_names[0])
+        for row_number, row in enumerate(rows, start=2):
+            if len(row) <= max(level_col, title_col):
+                continue
+            try:
+                level = int(row[level_col]) - 1
+            except ValueError:
+                if errors is not None:
+                    errors.append((row_number, f"level {row[level_col]!r} is not a number"))
+                continue
+            yield max(level, 0), row[title_col].strip()
+        return
+    for row in itertools.chain((first,), rows):
+        for level, cell in enumerate(row):
+            if cell.strip():
+                yield level, cell.strip()
+                break
+
+def iter_outline_file(path, indent_width=DEFAULT_INDENT_WIDTH, errors=None):
+    """Picks a reader from the file extension; anything unknown is plain text."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".opml", ".xml"):
+        yield from iter_opml_outline(path)
+        return
+    if ext in (".csv", ".tsv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            yield from iter_csv_outline(f, "\t" if ext == ".tsv" else ",", errors)
+        return
+    with open(path, "r", encoding="utf-8-sig") as f:
+        if ext in (".md", ".markdown"):
+            yield from iter_markdown_outline(f, indent_width, errors)
+        else:
+            yield from iter_text_outline(f, indent_width, errors)
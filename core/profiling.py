@@ -0,0 +1,157 @@
+"""Opt-in cProfile and tracemalloc captures written to timestamped files."""
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Allocation sites and functions listed in a capture's text report.
+PROFILE_TOP = 30
+# Captures kept in a directory; older ones are deleted.
+PROFILE_KEEP = 20
+
+# Captures may overlap (tree build on the main thread, apply in the
+# background), so tracemalloc is started by the first and stopped by the
+# last, and never stopped if something else had started it.
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+def _start_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0:
+            _tracing_owned = not tracemalloc.is_tracing()
+            if _tracing_owned:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+        _tracing_users += 1
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+
+def prune_captures(directory, keep=PROFILE_KEEP):
+    """Deletes all but the newest keep captures in directory."""
+    try:
+        stems = sorted({
+            os.path.splitext(name)[0]
+            for name in os.listdir(directory)
+            if name.endswith((".prof", ".txt"))
+        })
+    except OSError:
+        return
+    for stem in stems[:-keep] if keep else stems:
+        for ext in (".prof", ".txt"):
+            try:
+                os.remove(os.path.join(directory, stem + ext))
+            except OSError:
+                pass
+
+class ProfileCapture:
+    """
+    Context manager running its block under cProfile and tracemalloc. On
+    exit it writes <timestamp>-<name>.prof, readable with pstats or
+    snakeviz, and <timestamp>-<name>.txt with the wall time, peak traced
+    memory, the largest allocation sites still alive and the functions
+    with the most cumulative time. tracemalloc sees every thread; cProfile
+    only sees the thread that entered the block before Python 3.12, and
+    every thread from 3.12 on. From 3.12 only one profiler can be active
+    at a time, so a capture overlapping another one (or any other running
+    profiler) records memory only and writes just the .txt report.
+    on_written(paths) is called once the files exist. Write errors are
+    printed, never raised.
+    """
+
+    def __init__(self, directory, name, top=PROFILE_TOP, keep=PROFILE_KEEP, on_written=None):
+        self.directory = directory
+        self.name = name
+        self.top = top
+        self.keep = keep
+        self.on_written = on_written
+        self.paths = None
+        self._profiler = None
+        self._profiler_error = None
+
+    def __enter__(self):
+        _start_tracing()
+        self._started_at = datetime.now()
+        self._started = time.perf_counter()
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiler is already active (Python 3.12+).
+            self._profiler_error = str(e)
+        else:
+            self._profiler = profiler
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profiler is not None:
+            self._profiler.disable()
+        ms = (time.perf_counter() - self._started) * 1000
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            _stop_tracing()
+        outcome = "ok" if exc_type is None else f"raised {exc_type.__name__}"
+        try:
+            self.write(ms, peak, snapshot, outcome)
+        except OSError as e:
+            print("Error writing profile:", e)
+            return False
+        if self.on_written is not None:
+            self.on_written(self.paths)
+        return False
+
+    def write(self, ms, peak, snapshot, outcome):
+        os.makedirs(self.directory, exist_ok=True)
+        stem = f"{self._started_at:%Y%m%d-%H%M%S-%f}"[:-3] + f"-{self.name}"
+        report_path = os.path.join(self.directory, stem + ".txt")
+        self.paths = (report_path,)
+        if self._profiler is not None:
+            prof_path = os.path.join(self.directory, stem + ".prof")
+            self._profiler.dump_stats(prof_path)
+            self.paths = (prof_path, report_path)
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(self.report(ms, peak, snapshot, outcome))
+        prune_captures(self.directory, self.keep)
+
+    def report(self, ms, peak, snapshot, outcome):
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        lines = [
+            f"Profile: {self.name}",
+            f"Captured: {self._started_at:%Y-%m-%d %H:%M:%S}",
+            f"Wall time: {ms:,.1f} ms",
+            f"Peak traced memory: {peak / 2 ** 20:,.2f} MiB",
+            f"Outcome: {outcome}",
+            "",
+            f"Top {self.top} allocation sites still alive at the end:",
+        ]
+        for i, stat in enumerate(snapshot.statistics("lineno")[:self.top], start=1):
+            frame = stat.traceback[0]
+            lines.append(
+                f"{i:>4}. {stat.size / 1024:>10,.1f} KiB in {stat.count:>8,} blocks"
+                f"  {frame.filename}:{frame.lineno}"
+            )
+        if self._profiler is None:
+            lines += ["", f"Functions not profiled: {self._profiler_error}"]
+            return "\n".join(lines)
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        lines += ["", f"Top {self.top} functions by cumulative time:", stream.getvalue()]
+        return "\n".join(lines)
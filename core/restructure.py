@@ -0,0 +1,164 @@
+"""Reshaping applied hierarchies: moving subtrees and renumbering."""
+import re
+from dataclasses import dataclass
+
+def reparented_tag(source, new_parent):
+    """Name source gets when moved under new_parent (top level if empty)."""
+    leaf = source.rpartition("::")[2]
+    return f"{new_parent}::{leaf}" if new_parent else leaf
+
+def reparent_problem(source, new_parent):
+    """Returns why the move is not possible, or None."""
+    if not source:
+        return "Choose the tag to move."
+    if new_parent.lower() == source.lower() or new_parent.lower().startswith(source.lower() + "::"):
+        return "A tag cannot be moved under itself."
+    if reparented_tag(source, new_parent).lower() == source.lower():
+        return "The tag is already under that parent."
+    return None
+
+OUTLINE_NUMBER = re.compile(r"(^|::)\d+_")
+
+def outline_key(path):
+    """The path with its NN_ enumeration prefixes removed."""
+    return OUTLINE_NUMBER.sub(r"\1", path)
+
+def _index_by_key(paths):
+    by_key = {}
+    ambiguous = set()
+    for path in paths:
+        key = outline_key(path)
+        if key in by_key:
+            ambiguous.add(key)
+        by_key[key] = path
+    return by_key, ambiguous
+
+def plan_renumber(old_paths, new_paths, parent_tag=""):
+    """
+    Diffs two enumerated outlines (as from enumerate_outline, without the
+    parent tag) applied under parent_tag and returns
+    (renames, removals, skipped).
+    A new item is matched to the old item with the same unnumbered path;
+    failing that, to the old child of its matched parent with the same
+    text; failing that, to the old item with the same text if that text
+    occurs once in each outline and the old item's place is gone. The last
+    two find lines moved to another parent, with their children.
+    renames is an ordered list of (current_tag, new_tag): parents come
+    first, and because renaming a tag also renames its subtree, a child is
+    only listed when its own name changed. removals are the top-most
+    unmatched old items, named as they will be after the renames. Items
+    whose unnumbered path occurs more than once, and their descendants, are
+    left alone; skipped lists those unnumbered paths in outline order.
+
+    >>> plan_renumber(["01_A", "02_B"], ["01_A"])
+    ([], ['02_B'], [])
+    >>> plan_renumber(["01_A", "02_B"], ["01_A"], "P")
+    ([], ['P::02_B'], [])
+    >>> plan_renumber(["01_A", "02_B", "03_C"], ["01_B", "02_C"], "P")
+    ([('P::02_B', 'P::01_B'), ('P::03_C', 'P::02_C')], ['P::01_A'], [])
+    >>> plan_renumber(["01_A", "01_A::01_X", "01_A::01_X::01_Y", "02_B"],
+    ...               ["01_A", "02_B", "02_B::01_X", "02_B::01_X::01_Y"], "P")
+    ([('P::01_A::01_X', 'P::02_B::01_X')], [], [])
+    >>> plan_renumber(["01_A", "02_B", "03_B"], ["01_B", "02_B", "03_A"])
+    ([('01_A', '03_A')], [], ['B'])
+    """
+    prefix = f"{parent_tag}::" if parent_tag else ""
+    old_by_key, old_ambiguous = _index_by_key(old_paths)
+    new_by_key, new_ambiguous = _index_by_key(new_paths)
+    ambiguous = old_ambiguous | new_ambiguous
+
+    def is_ambiguous(key):
+        while key:
+            if key in ambiguous:
+                return True
+            key = key.rpartition("::")[0]
+        return False
+
+    old_children = {}
+    old_by_text = {}
+    for key, old in old_by_key.items():
+        parent, _, text = old.rpartition("::")
+        text = outline_key(text)
+        old_children.setdefault((parent, text), []).append(old)
+        old_by_text.setdefault(text, []).append(old)
+    new_text_count = {}
+    for key in new_by_key:
+        text = key.rpartition("::")[2]
+        new_text_count[text] = new_text_count.get(text, 0) + 1
+
+    matched_old = set()
+
+    def pick(candidates):
+        free = [
+            old for old in candidates
+            if old not in matched_old
+            and outline_key(old) not in new_by_key
+            and not is_ambiguous(outline_key(old))
+        ]
+        return free[0] if len(free) == 1 else None
+
+    # Name each old item has once the renames planned so far have run.
+    renamed = {}
+
+    def current(old):
+        if old in renamed:
+            return renamed[old]
+        parent, _, segment = old.rpartition("::")
+        return f"{current(parent)}::{segment}" if parent else prefix + segment
+
+    match = {}
+    renames = []
+    for key, new in new_by_key.items():
+        if is_ambiguous(key):
+            continue
+        text = key.rpartition("::")[2]
+        old = old_by_key.get(key)
+        parent_new = new.rpartition("::")[0]
+        if old is None and parent_new in match:
+            old = pick(old_children.get((match[parent_new], text), ()))
+        if old is None and new_text_count[text] == 1 and len(old_by_text.get(text, ())) == 1:
+            old = pick(old_by_text[text])
+        if old is None:
+            continue
+        match[new] = old
+        matched_old.add(old)
+        name = current(old)
+        if name != prefix + new:
+            renames.append((name, prefix + new))
+        renamed[old] = prefix + new
+    removals = []
+    for key, old in old_by_key.items():
+        if old in matched_old or is_ambiguous(key):
+            continue
+        parent = old.rpartition("::")[0]
+        if parent and parent not in matched_old:
+            # Removing the parent removes this too.
+            continue
+        removals.append(current(old))
+    skipped = [
+        key for key in dict.fromkeys(map(outline_key, [*old_paths, *new_paths]))
+        if key in ambiguous
+    ]
+    return renames, removals, skipped
+
+@dataclass
+class RenumberResult:
+    changes: object
+    renamed: int
+    removed: int
+    notes_changed: int
+
+def renumber_op(col, renames, removals):
+    """Runs the planned renames and removals as a single undo step."""
+    undo_pos = col.add_custom_undo_entry("Renumber Subtags")
+    notes_changed = 0
+    for old, new in renames:
+        notes_changed += col.tags.rename(old, new).count
+    if removals:
+        notes_changed += col.tags.remove(" ".join(removals)).count
+    return RenumberResult(
+        changes=col.merge_undo_entries(undo_pos),
+        renamed=len(renames),
+        removed=len(removals),
+        notes_changed=notes_changed,
+    )
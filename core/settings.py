@@ -0,0 +1,120 @@
+"""Settings file format: expansion state encoding and atomic reads/writes."""
+import json
+import os
+import tempfile
+
+# Most expanded tree nodes remembered; the least recently expanded go first.
+EXPANSION_LIMIT = 5000
+
+def encode_paths(paths):
+    """
+    Front-codes tag paths: sorted, each stored as [shared prefix length with
+    the previous path, remaining suffix].
+    """
+    encoded = []
+    prev = ""
+    for path in sorted(paths):
+        shared = len(os.path.commonprefix((prev, path)))
+        encoded.append([shared, path[shared:]])
+        prev = path
+    return encoded
+
+def decode_paths(encoded):
+    paths = []
+    prev = ""
+    for shared, suffix in encoded:
+        prev = prev[:shared] + suffix
+        paths.append(prev)
+    return paths
+
+class ExpansionState:
+    """
+    Paths of the expanded nodes in the tag tree. Collapsed nodes are simply
+    absent, and entries are kept in expansion order so the oldest can be
+    dropped once EXPANSION_LIMIT is reached.
+    """
+
+    def __init__(self, paths=()):
+        self._paths = dict.fromkeys(paths)
+
+    @classmethod
+    def from_settings(cls, data):
+        if "expanded" in data:
+            expanded = data["expanded"]
+            paths = decode_paths(expanded["paths"])
+            return cls(paths[i] for i in expanded["order"])
+        # Older versions stored every path ever toggled with a bool.
+        legacy = data.pop("expansions", {})
+        return cls(path for path, expanded in legacy.items() if expanded)
+
+    def __contains__(self, path):
+        return path in self._paths
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def set(self, path, expanded):
+        self._paths.pop(path, None)
+        if expanded:
+            self._paths[path] = None
+            while len(self._paths) > EXPANSION_LIMIT:
+                del self._paths[next(iter(self._paths))]
+
+    def prune(self, exists):
+        """Drops paths for which exists(path) is false; returns how many."""
+        stale = [path for path in self._paths if not exists(path)]
+        for path in stale:
+            del self._paths[path]
+        return len(stale)
+
+    def encode(self):
+        """
+        Front-coded paths, which need sorting, plus their positions in that
+        sorted list from least to most recently expanded.
+        """
+        ranks = sorted(range(len(self._paths)), key=list(self._paths).__getitem__)
+        order = [0] * len(ranks)
+        for position, i in enumerate(ranks):
+            order[i] = position
+        return {"paths": encode_paths(self._paths), "order": order}
+
+def settings_json_default(obj):
+    if isinstance(obj, ExpansionState):
+        return obj.encode()
+    raise TypeError(f"Cannot serialise {type(obj).__name__}")
+
+def load_settings(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print("Error loading settings:", e)
+        return {}
+
+def write_file_atomically(path, text):
+    """Writes text to a temporary file and renames it over path."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".write-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_settings_file(path, data):
+    write_file_atomically(
+        path, json.dumps(data, separators=(",", ":"), default=settings_json_default)
+    )
@@ -0,0 +1,42 @@
+"""A collection's tags with the indexes built from them."""
+from .completion import TagCompletionIndex
+from .tagtree import TagSearchIndex, TagTrie
+
+class TagSnapshot:
+    """
+    The collection's tags, split into hierarchy segments and sorted by them,
+    plus the trie, search and completion indexes derived from them. One snapshot is shared
+    by every dialog until the collection's tags change.
+    """
+
+    def __init__(self, tags):
+        self.parts = sorted(tag.split("::") for tag in tags)
+        self.tags = ["::".join(parts) for parts in self.parts]
+        self._trie = None
+        self._search_index = None
+        self._completion_index = None
+        self._lower_tags = None
+
+    @property
+    def lower_tags(self):
+        if self._lower_tags is None:
+            self._lower_tags = {tag.lower() for tag in self.tags}
+        return self._lower_tags
+
+    @property
+    def trie(self):
+        if self._trie is None:
+            self._trie = TagTrie(self.parts)
+        return self._trie
+
+    @property
+    def search_index(self):
+        if self._search_index is None:
+            self._search_index = TagSearchIndex(self.trie)
+        return self._search_index
+
+    @property
+    def completion_index(self):
+        if self._completion_index is None:
+            self._completion_index = TagCompletionIndex(self.tags)
+        return self._completion_index
@@ -0,0 +1,257 @@
+"""Compact tag trie and the incremental search index over it."""
+from array import array
+from bisect import bisect_right
+
+class TagTrie:
+    """
+    Array-backed trie of tag segments. Nodes are numbered in preorder with
+    node 0 as an invisible root, so a node's subtree is the id range
+    [n, end[n]). Segment strings are interned once in `segments`, and the
+    children of every node are kept contiguously in `child_list` starting at
+    `child_offset[n]`, which gives the tree model O(1) row lookups.
+    """
+
+    def __init__(self, sorted_parts):
+        """sorted_parts: tags split on "::" and sorted, see TagSnapshot."""
+        self.segments = []
+        seg_ids = {}
+        parent = array("i", [-1])
+        seg = array("i", [-1])
+        end = array("i", [0])
+        is_tag = bytearray(1)
+        stack = [0]
+        prev_parts = []
+        # Sorting by segments keeps every subtree contiguous, so one pass
+        # with a stack of the current path builds the preorder numbering.
+        for parts in sorted_parts:
+            common = 0
+            limit = min(len(parts), len(prev_parts))
+            while common < limit and parts[common] == prev_parts[common]:
+                common += 1
+            while len(stack) > common + 1:
+                end[stack.pop()] = len(parent)
+            for part in parts[common:]:
+                sid = seg_ids.get(part)
+                if sid is None:
+                    sid = seg_ids[part] = len(self.segments)
+                    self.segments.append(part)
+                parent.append(stack[-1])
+                seg.append(sid)
+                end.append(0)
+                is_tag.append(0)
+                stack.append(len(parent) - 1)
+            is_tag[stack[-1]] = 1
+            prev_parts = parts
+        while stack:
+            end[stack.pop()] = len(parent)
+
+        size = len(parent)
+        child_count = array("i", bytes(4 * size))
+        row = array("i", bytes(4 * size))
+        for n in range(1, size):
+            p = parent[n]
+            row[n] = child_count[p]
+            child_count[p] += 1
+        child_offset = array("i", bytes(4 * size))
+        total = 0
+        for n in range(size):
+            child_offset[n] = total
+            total += child_count[n]
+        child_list = array("i", bytes(4 * total))
+        for n in range(1, size):
+            child_list[child_offset[parent[n]] + row[n]] = n
+
+        self.seg_ids = seg_ids
+        self.parent = parent
+        self.seg = seg
+        self.end = end
+        self.is_tag = is_tag
+        self.row = row
+        self.child_count = child_count
+        self.child_offset = child_offset
+        self.child_list = child_list
+
+    @classmethod
+    def from_tags(cls, tags):
+        return cls(sorted(tag.split("::") for tag in tags))
+
+    def __len__(self):
+        return len(self.parent) - 1
+
+    def segment(self, node):
+        return self.segments[self.seg[node]]
+
+    def path(self, node):
+        parts = []
+        while node > 0:
+            parts.append(self.segments[self.seg[node]])
+            node = self.parent[node]
+        return "::".join(reversed(parts))
+
+    def child(self, node, row):
+        return self.child_list[self.child_offset[node] + row]
+
+    def find(self, tag):
+        """Returns the node id for a full tag path, or None."""
+        node = 0
+        for part in tag.split("::"):
+            if part not in self.seg_ids:
+                return None
+            # Children are sorted by segment, so binary search them.
+            lo = self.child_offset[node]
+            hi = lo + self.child_count[node]
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.segments[self.seg[self.child_list[mid]]] < part:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo == self.child_offset[node] + self.child_count[node]:
+                return None
+            candidate = self.child_list[lo]
+            if self.segments[self.seg[candidate]] != part:
+                return None
+            node = candidate
+        return node if node else None
+
+    # How many nodes are laid out between staleness checks.
+    LAYOUT_CHECK_EVERY = 8192
+
+    def visible_layout(self, nodes, is_stale=None):
+        """
+        Lays out a filtered view of the trie: (children, rows) where
+        children maps a node to its visible children in order and rows maps
+        a visible node to its row under its parent. nodes must include
+        their ancestors. Returns None for None or a set covering the whole
+        trie, which the model shows unfiltered. is_stale is polled as in
+        TagSearchIndex.search.
+        """
+        if nodes is None or len(nodes) >= len(self):
+            return None
+        children = {}
+        rows = {}
+        parent = self.parent
+        # Preorder ids keep siblings in display order once sorted.
+        ordered = sorted(nodes)
+        for i in range(0, len(ordered), self.LAYOUT_CHECK_EVERY):
+            if is_stale and is_stale():
+                raise SearchSuperseded()
+            for n in ordered[i:i + self.LAYOUT_CHECK_EVERY]:
+                siblings = children.setdefault(parent[n], [])
+                rows[n] = len(siblings)
+                siblings.append(n)
+        return children, rows
+
+class SearchSuperseded(Exception):
+    """Raised inside a search pass once newer input has made it pointless."""
+
+class TagSearchIndex:
+    """
+    Search index over a TagTrie. The lowercase full path of every node is
+    concatenated in preorder into one newline separated string, tokens are
+    located with str.find and each hit is mapped back to its node by
+    bisecting the path start offsets. A node's path prefixes those of its
+    descendants, so a hit covers the node's whole subtree range and the scan
+    resumes after it.
+    """
+
+    # Narrow the previous matches instead of rescanning when they are at
+    # most this fraction of the tree.
+    NARROW_RATIO = 0.25
+
+    def __init__(self, trie):
+        self.trie = trie
+        lower_segments = [s.lower() for s in trie.segments]
+        size = len(trie.parent)
+        paths = [""] * size
+        starts = array("q", bytes(8 * (size + 1)))
+        offset = 0
+        for n in range(1, size):
+            p = trie.parent[n]
+            segment = lower_segments[trie.seg[n]]
+            path = f"{paths[p]}::{segment}" if p else segment
+            paths[n] = path
+            starts[n] = offset
+            offset += len(path) + 1
+        starts[size] = offset
+        self.blob = "\n".join(paths[1:]) + "\n" if size > 1 else ""
+        self.starts = starts
+        self._last_tokens = None
+        self._last_matches = None
+
+    def lower_path(self, node):
+        return self.blob[self.starts[node]:self.starts[node + 1] - 1]
+
+    # How many hits or candidates are processed between staleness checks.
+    CHECK_EVERY = 2048
+
+    def _scan(self, token, matches, roots, is_stale):
+        blob = self.blob
+        starts = self.starts
+        end = self.trie.end
+        last = len(starts) - 1
+        hits = 0
+        pos = blob.find(token)
+        while pos != -1:
+            node = bisect_right(starts, pos, 1, last) - 1
+            stop = end[node]
+            if node not in matches:
+                roots.append(node)
+                matches.update(range(node, stop))
+            hits += 1
+            if is_stale and hits % self.CHECK_EVERY == 0 and is_stale():
+                raise SearchSuperseded()
+            pos = blob.find(token, starts[stop])
+
+    def _narrow(self, tokens, candidates, is_stale):
+        lower_path = self.lower_path
+        matches = set()
+        candidates = list(candidates)
+        for i in range(0, len(candidates), self.CHECK_EVERY):
+            if is_stale and is_stale():
+                raise SearchSuperseded()
+            matches.update(
+                n for n in candidates[i:i + self.CHECK_EVERY]
+                if any(tok in lower_path(n) for tok in tokens)
+            )
+        return matches
+
+    def _extends_last(self, tokens):
+        last = self._last_tokens
+        return (
+            last is not None
+            and len(last) == len(tokens)
+            and all(old in new for old, new in zip(last, tokens))
+        )
+
+    def search(self, query, is_stale=None):
+        """
+        Returns the set of nodes whose full path contains any whitespace
+        separated token of query, plus their ancestors, or None when the
+        query is empty. is_stale is polled during the pass; once it returns
+        True the pass stops with SearchSuperseded.
+        """
+        tokens = [t.lower() for t in query.split()]
+        if not tokens:
+            self._last_tokens = self._last_matches = None
+            return None
+        if self._extends_last(tokens) and (
+            len(self._last_matches) <= self.NARROW_RATIO * len(self.trie)
+        ):
+            matches = self._narrow(tokens, self._last_matches, is_stale)
+            roots = matches
+        else:
+            matches = set()
+            roots = []
+            for tok in tokens:
+                self._scan(tok, matches, roots, is_stale)
+        self._last_tokens = tokens
+        self._last_matches = matches
+        visible = set(matches)
+        parent = self.trie.parent
+        for n in roots:
+            a = parent[n]
+            while a > 0 and a not in visible:
+                visible.add(a)
+                a = parent[a]
+        return visible